@@ -1,35 +1,97 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import and_, or_, func
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from .db import get_db
-from .models import Ticket, User, UserRole, TicketStatus
+from pydantic import BaseModel, ValidationError
+from .db import get_db, SessionLocal
+from .models import Ticket, User, UserRole, TicketStatus, ReplyStatus
+from .departments import DEPARTMENT_MAPPING
 from .services.classifier import TicketClassifierService
-from .services.gemini import GeminiService
-from datetime import datetime
-import random
-import string
+from .services.batcher import MicroBatcher
+from .services.gemini import get_gemini_service
+from .services.reply_worker import ReplyPipeline
+from .services.executors import run_inference
+from .services.embedding_index import DUPLICATE_DETECTION, DUPLICATE_INDEX_PATH, EmbeddingIndex
+from .services.metrics import DUPLICATE_TICKETS, ERRORS, span
+from .services.profiler import PROFILER_ENABLED, SamplingProfiler
+from .services.model_registry import current_version, list_versions, set_current
+from .services.ticket_numbers import TicketNumberAllocator
+from .services.rollups import apply_deltas, read_stats, record_inserts, record_move, ticket_key
+from collections import Counter
+from datetime import date, datetime
+from typing import Optional
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
 
 router = APIRouter()
-classifier_service = TicketClassifierService()
-gemini_service = GeminiService()
-
-# Department mapping
-DEPARTMENT_MAPPING = {
-    "Technical Support": "technical_support",
-    "IT Support": "technical_support",
-    "Product Support": "technical_support",
-    "Billing and Payments": "accounting",
-    "Returns and Exchanges": "accounting",
-    "Sales and Pre-Sales": "sales",
-    "Customer Service": "sales",
-    "General Inquiry": "sales"
-}
+# The model is loaded at startup in the background (see main.py) so the worker answers
+# liveness probes immediately. PRELOAD_MODEL=true loads it here instead, at import time -
+# under `gunicorn --preload` that happens once in the master, before workers are forked.
+classifier_service = TicketClassifierService(load=False)
+if os.getenv("PRELOAD_MODEL", "false").lower() == "true":
+    classifier_service.load()
+classifier_batcher = MicroBatcher(classifier_service.predict_batch_with_version)
+# Near-duplicate detection (DUPLICATE_DETECTION=true): classification and embedding come from one
+# encoder pass, batched the same way; the index of recent tickets is per worker process
+duplicate_index = EmbeddingIndex() if DUPLICATE_DETECTION else None
+if duplicate_index is not None:
+    print(f"🔎 Duplicate index: {duplicate_index.load(DUPLICATE_INDEX_PATH)} recent ticket(s) loaded")
+embedding_batcher = MicroBatcher(classifier_service.predict_batch_embedded)
+gemini_service = get_gemini_service()
+reply_pipeline = ReplyPipeline(gemini_service)
+ticket_numbers = TicketNumberAllocator()
 
 def generate_ticket_number():
-    """Generate a unique ticket number like TKT-20260125-ABCD"""
-    date_str = datetime.now().strftime("%Y%m%d")
-    random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-    return f"TKT-{date_str}-{random_str}"
+    """Generate a unique ticket number like TKT-20260125-0K3M7Q2A (see ticket_numbers.py)"""
+    return ticket_numbers.next()
+
+def save_ticket(db: Session, ticket: Ticket):
+    """Blocking DB write - call through run_in_threadpool from async endpoints.
+    The ticket and its dashboard rollup are committed together."""
+    db.add(ticket)
+    db.flush()
+    record_inserts(db, [ticket])
+    db.commit()
+    db.refresh(ticket)
+    return ticket
+
+# Bulk ingestion tuning: tickets per DB transaction, and per forward pass
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+BULK_INFERENCE_BATCH_SIZE = int(os.getenv("BULK_INFERENCE_BATCH_SIZE", "64"))
+# Export: rows per keyset read (and per streamed write)
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+def require_model():
+    if not classifier_service.loaded:
+        raise HTTPException(status_code=503, detail="Classifier model is still loading")
+
+def classify_many(texts):
+    """Classify a large list in tensor batches - blocking, run on the inference pool.
+    Returns (label, model_version) pairs."""
+    results = []
+    for i in range(0, len(texts), BULK_INFERENCE_BATCH_SIZE):
+        results.extend(classifier_service.predict_batch_with_version(texts[i:i + BULK_INFERENCE_BATCH_SIZE]))
+    return results
+
+def insert_tickets(rows):
+    """Insert many tickets in one transaction; returns their (id, ticket_number) in order"""
+    db = SessionLocal()
+    try:
+        tickets = [Ticket(**row) for row in rows]
+        db.add_all(tickets)
+        db.flush()
+        record_inserts(db, tickets)
+        saved = [(ticket.id, ticket.ticket_number) for ticket in tickets]
+        db.commit()
+        return saved
+    finally:
+        db.close()
 
 # Request/Response Models
 class LoginRequest(BaseModel):
@@ -51,25 +113,191 @@ class TicketRequest(BaseModel):
 class TicketResponse(BaseModel):
     ticket_number: str
     queue: str
-    auto_reply: str
+    auto_reply: Optional[str] = None
+    reply_status: str
     assigned_department: str
+    duplicate_of: Optional[str] = None
+
+class RuleTestRequest(BaseModel):
+    text: str
+
+class ClassifyRequest(BaseModel):
+    texts: list[str]
+
+class ReplyResponse(BaseModel):
+    ticket_number: str
+    reply_status: str
+    auto_reply: Optional[str] = None
 
 class TicketListItem(BaseModel):
     id: int
     ticket_number: str
     client_name: str
+    body_preview: str
+    predicted_queue: str
+    assigned_department: str
+    status: str
+    reply_status: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class TicketStatusUpdate(BaseModel):
+    status: TicketStatus
+
+class TicketDetail(BaseModel):
+    id: int
+    ticket_number: str
+    client_id: int
+    client_name: str
     body: str
     predicted_queue: str
+    model_version: Optional[str] = None
     assigned_department: str
+    generated_reply: Optional[str] = None
+    reply_status: Optional[str] = None
+    parent_ticket_id: Optional[int] = None
     status: str
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+# Columns returned by list endpoints - leaves out the large body/generated_reply Text columns
+BODY_PREVIEW_LENGTH = 120
+LIST_COLUMNS = (
+    Ticket.id,
+    Ticket.ticket_number,
+    Ticket.client_name,
+    func.substr(Ticket.body, 1, BODY_PREVIEW_LENGTH).label("body_preview"),
+    Ticket.predicted_queue,
+    Ticket.assigned_department,
+    Ticket.status,
+    Ticket.reply_status,
+    Ticket.created_at,
+)
+
+def encode_cursor(created_at: datetime, ticket_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{ticket_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, ticket_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(ticket_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_page(query, limit: int, cursor: Optional[str] = None):
+    """Newest-first page over (created_at, id); returns (rows, next_cursor)"""
+    if cursor:
+        created_at, ticket_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Ticket.created_at < created_at,
+            and_(Ticket.created_at == created_at, Ticket.id < ticket_id)
+        ))
+    rows = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+def role_tickets_query(db: Session, role: str, user_id: int):
+    """List query for what `role` may see (also used by benchmarks/bench_db.py)"""
+    query = db.query(*LIST_COLUMNS)
+    
+    if role == "admin":
+        # Admin sees all tickets
+        pass
+    elif role == "client":
+        # Client sees only their tickets
+        query = query.filter(Ticket.client_id == user_id)
+    elif role in ["technical_support", "accounting", "sales"]:
+        # Department staff sees only their department's tickets
+        query = query.filter(Ticket.assigned_department == role)
+    else:
+        raise HTTPException(status_code=403, detail="Invalid role")
+    return query
+
+# Export columns - everything TicketDetail has, in CSV column order
+EXPORT_COLUMNS = (
+    Ticket.id,
+    Ticket.ticket_number,
+    Ticket.client_id,
+    Ticket.client_name,
+    Ticket.body,
+    Ticket.predicted_queue,
+    Ticket.model_version,
+    Ticket.assigned_department,
+    Ticket.generated_reply,
+    Ticket.reply_status,
+    Ticket.parent_ticket_id,
+    Ticket.status,
+    Ticket.created_at,
+    Ticket.updated_at,
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (TicketStatus, ReplyStatus)):
+        return value.value
+    return value
+
+def export_filters(department, queue, status, since, until):
+    filters = []
+    if department:
+        filters.append(Ticket.assigned_department == department)
+    if queue:
+        filters.append(Ticket.predicted_queue == queue)
+    if status:
+        filters.append(Ticket.status == status)
+    if since:
+        filters.append(Ticket.created_at >= since)
+    if until:
+        filters.append(Ticket.created_at < until)
+    return filters
+
+def export_chunks(filters, max_id):
+    """Matching tickets in id order, EXPORT_CHUNK_SIZE at a time. Each chunk is its own short query
+    and session, so no transaction or connection is held while the client reads."""
+    last_id = 0
+    while True:
+        with SessionLocal() as db:
+            rows = db.query(*EXPORT_COLUMNS).filter(
+                Ticket.id > last_id, Ticket.id <= max_id, *filters
+            ).order_by(Ticket.id).limit(EXPORT_CHUNK_SIZE).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+def export_ndjson(chunks):
+    for rows in chunks:
+        yield "".join(
+            json.dumps({field: export_value(value) for field, value in zip(EXPORT_FIELDS, row)}) + "\n" for row in rows
+        )
+
+def export_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in chunks:
+        writer.writerows([export_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
 # Authentication
+# Endpoints that only touch the DB are plain `def` so FastAPI runs them in its threadpool
 @router.post("/login", response_model=LoginResponse)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+def login(request: LoginRequest, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.username == request.username).first()
     
     if not user or user.password != request.password:  # In production, use hashing!
@@ -89,73 +317,342 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
 # Create ticket
 @router.post("/predict", response_model=TicketResponse)
 async def predict_ticket(request: TicketRequest, db: Session = Depends(get_db)):
+    require_model()
+    # 1. Predict Queue (batched with other in-flight tickets). A model failure propagates
+    # as a logged 500 and is counted in errors_total{stage="classify"}
+    match = embedding = None
+    with span("classify"):
+        if duplicate_index is not None:
+            predicted_queue, model_version, embedding = await embedding_batcher.submit(request.description)
+        else:
+            predicted_queue, model_version = await classifier_batcher.submit(request.description)
+    
+    # 1b. A near-duplicate of a recent ticket joins it: same queue, its reply is reused
+    if embedding is not None:
+        with span("duplicate_search"):
+            match = await run_in_threadpool(duplicate_index.search, embedding, model_version)
+        if match is not None:
+            DUPLICATE_TICKETS.inc()
+            predicted_queue = match.queue
+    
+    # 2. Map to department
+    assigned_department = DEPARTMENT_MAPPING.get(predicted_queue, "sales")
+    
+    # 3. Generate ticket number
+    ticket_number = generate_ticket_number()
+    
+    # 4. Store in DB with the reply pending (off the event loop)
+    db_ticket = Ticket(
+        ticket_number=ticket_number,
+        client_id=request.client_id,
+        client_name=request.client_name,
+        body=request.description,
+        predicted_queue=predicted_queue,
+        model_version=model_version,
+        assigned_department=assigned_department,
+        status=TicketStatus.PENDING,
+        reply_status=ReplyStatus.PENDING,
+        parent_ticket_id=match.ticket_id if match else None
+    )
     try:
-        # 1. Predict Queue
-        predicted_queue = classifier_service.predict(request.description)
-        
-        # 2. Map to department
-        assigned_department = DEPARTMENT_MAPPING.get(predicted_queue, "sales")
-        
-        # 3. Generate ticket number
-        ticket_number = generate_ticket_number()
-        
-        # 4. Generate Reply using SN AI Bot
-        generated_reply = gemini_service.generate_reply(
-            request.description, 
-            predicted_queue, 
-            ticket_number, 
-            request.client_name
-        )
-        
-        # 5. Store in DB
-        db_ticket = Ticket(
-            ticket_number=ticket_number,
-            client_id=request.client_id,
-            client_name=request.client_name,
-            body=request.description,
-            predicted_queue=predicted_queue,
-            generated_reply=generated_reply,
-            assigned_department=assigned_department,
-            status=TicketStatus.PENDING
-        )
-        db.add(db_ticket)
-        db.commit()
-        db.refresh(db_ticket)
-        
-        return TicketResponse(
-            ticket_number=ticket_number,
-            queue=predicted_queue,
-            auto_reply=generated_reply,
-            assigned_department=assigned_department
+        with span("db_write"):
+            await run_in_threadpool(save_ticket, db, db_ticket)
+    except SQLAlchemyError as e:
+        ERRORS.inc(stage="db_write")
+        print(f"❌ Failed to store ticket {ticket_number}: {e}")
+        raise HTTPException(status_code=503, detail="Ticket could not be stored, please retry")
+    
+    # Only root tickets are indexed, so later duplicates link to the first ticket of their group
+    if embedding is not None and match is None:
+        await run_in_threadpool(
+            duplicate_index.add, db_ticket.id, ticket_number, predicted_queue, embedding, model_version
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    # 5. Hand reply generation (SN AI Bot) to the background pipeline
+    await reply_pipeline.enqueue(db_ticket.id)
+    
+    response = TicketResponse(
+        ticket_number=ticket_number,
+        queue=predicted_queue,
+        reply_status=ReplyStatus.PENDING.value,
+        assigned_department=assigned_department,
+        duplicate_of=match.ticket_number if match else None
+    )
+    # Encode here rather than leaving it to FastAPI, so the span covers the actual JSON encoding
+    with span("serialization"):
+        return Response(content=response.model_dump_json(), media_type="application/json")
+
+def get_ticket_by_number(db: Session, ticket_number: str):
+    return db.query(Ticket).filter(Ticket.ticket_number == ticket_number).first()
 
-# Get tickets based on role
-@router.get("/tickets/{role}/{user_id}")
-async def get_tickets(role: str, user_id: int, db: Session = Depends(get_db)):
+def parse_json_line(line: bytes):
     try:
-        query = db.query(Ticket)
-        
-        if role == "admin":
-            # Admin sees all tickets
-            tickets = query.order_by(Ticket.created_at.desc()).all()
-        elif role == "client":
-            # Client sees only their tickets
-            tickets = query.filter(Ticket.client_id == user_id).order_by(Ticket.created_at.desc()).all()
-        elif role in ["technical_support", "accounting", "sales"]:
-            # Department staff sees only their department's tickets
-            tickets = query.filter(Ticket.assigned_department == role).order_by(Ticket.created_at.desc()).all()
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+
+async def ingest_chunk(chunk, reply_mode: str):
+    """Validate, classify and insert one chunk; returns a result dict per input item"""
+    results = {}
+    valid = []
+    for index, item in chunk:
+        if isinstance(item, Exception):
+            results[index] = {"index": index, "error": str(item)}
+            continue
+        try:
+            valid.append((index, TicketRequest.model_validate(item)))
+        except ValidationError as e:
+            results[index] = {"index": index, "error": e.errors(include_url=False)}
+    
+    if valid:
+        try:
+            predictions = await run_inference(classify_many, [ticket.description for _, ticket in valid])
+            reply_status = ReplyStatus.PENDING if reply_mode == "defer" else ReplyStatus.SKIPPED
+            rows = []
+            for (_, ticket), (queue, model_version) in zip(valid, predictions):
+                rows.append({
+                    "ticket_number": generate_ticket_number(),
+                    "client_id": ticket.client_id,
+                    "client_name": ticket.client_name,
+                    "body": ticket.description,
+                    "predicted_queue": queue,
+                    "model_version": model_version,
+                    "assigned_department": DEPARTMENT_MAPPING.get(queue, "sales"),
+                    "status": TicketStatus.PENDING,
+                    "reply_status": reply_status,
+                })
+            with span("db_write"):
+                saved = await run_in_threadpool(insert_tickets, rows)
+        except Exception as e:
+            # Reported per item in the stream; the rest of the upload carries on
+            ERRORS.inc(stage="bulk_ingest")
+            for index, _ in valid:
+                results[index] = {"index": index, "error": str(e)}
         else:
-            raise HTTPException(status_code=403, detail="Invalid role")
-        
-        return tickets
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+            for (index, _), row, (ticket_id, ticket_number) in zip(valid, rows, saved):
+                if reply_mode == "defer":
+                    await reply_pipeline.enqueue(ticket_id)
+                results[index] = {
+                    "index": index,
+                    "ticket_number": ticket_number,
+                    "queue": row["predicted_queue"],
+                    "assigned_department": row["assigned_department"],
+                    "reply_status": row["reply_status"].value,
+                }
+    
+    return [results[index] for index, _ in chunk]
+
+async def stream_bulk_results(items, reply_mode: str):
+    chunk = []
+    index = 0
+    for item in items:
+        chunk.append((index, item))
+        index += 1
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            for result in await ingest_chunk(chunk, reply_mode):
+                yield json.dumps(result) + "\n"
+            chunk = []
+    if chunk:
+        for result in await ingest_chunk(chunk, reply_mode):
+            yield json.dumps(result) + "\n"
+
+# Bulk import: body is a JSON array of TicketRequest objects, or NDJSON (Content-Type: application/x-ndjson)
+# Streams back one NDJSON result line per ticket, in input order, as each chunk is committed.
+# The body is read up front: the streaming response owns the receive channel once it starts.
+# reply=defer queues auto-replies in the background pipeline, reply=skip stores tickets without one.
+@router.post("/tickets/bulk")
+async def bulk_create_tickets(request: Request, reply: str = Query("defer", pattern="^(defer|skip)$")):
+    require_model()
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        # Parsed lazily, line by line, so a bad line only fails that ticket
+        items = (parse_json_line(line) for line in body.splitlines() if line.strip())
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    
+    return StreamingResponse(stream_bulk_results(items, reply), media_type="application/x-ndjson")
+
+# Poll for the generated reply; pass ?wait=N to long-poll up to N seconds while it is pending
+@router.get("/replies/{ticket_number}", response_model=ReplyResponse)
+async def get_reply(ticket_number: str, wait: float = 0, db: Session = Depends(get_db)):
+    ticket = await run_in_threadpool(get_ticket_by_number, db, ticket_number)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    
+    if ticket.reply_status == ReplyStatus.PENDING and wait > 0:
+        await reply_pipeline.wait_for(ticket.id, min(wait, 30))
+        await run_in_threadpool(db.refresh, ticket)
+    
+    # Tickets created before the pipeline existed have no status but do have a reply
+    status = ticket.reply_status or ReplyStatus.READY
+    return ReplyResponse(
+        ticket_number=ticket.ticket_number,
+        reply_status=status.value,
+        auto_reply=ticket.generated_reply
+    )
+
+# Cache effectiveness counters
+@router.get("/cache-stats")
+def cache_stats():
+    stats = {
+        "reply_cache": gemini_service.cache_stats(),
+        "classification_cache": classifier_service.cache_stats(),
+    }
+    if duplicate_index is not None:
+        stats["duplicate_index"] = duplicate_index.stats()
+    return stats
+
+# Dashboard counts per department, queue, status and day, read from the rollup table instead of
+# tallying tickets (optionally one department and a day range; detail=true adds the raw rows)
+@router.get("/stats")
+def ticket_stats(
+    department: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    detail: bool = False,
+    db: Session = Depends(get_db)
+):
+    with span("stats"):
+        return read_stats(db, department, since, until, detail)
+
+# How often each cascade stage answered, and how often the first stage escalated to BERT
+@router.get("/classifier-stats")
+def classifier_stats():
+    return classifier_service.stage_stats()
+
+# Per-ticket cascade decision without storing anything - for tuning CASCADE_THRESHOLD
+@router.post("/admin/classify")
+async def classify_texts(request: ClassifyRequest):
+    require_model()
+    return await run_inference(classifier_service.predict_batch_detailed, request.texts)
+
+# Get tickets based on role, newest first, one keyset page at a time
+# The cursor for the next page is returned in the X-Next-Cursor header (absent on the last page)
+@router.get("/tickets/{role}/{user_id}", response_model=list[TicketListItem])
+def get_tickets(
+    role: str,
+    user_id: int,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    tickets, next_cursor = keyset_page(role_tickets_query(db, role, user_id), limit, cursor)
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return tickets
+
+# Stream every matching ticket (full rows) as NDJSON or CSV, oldest first. Rows are read in
+# keyset chunks and written as they are read, so memory stays flat however large the export.
+# Tickets created after the export starts are not included.
+# Registered before /tickets/{ticket_id} so "export" isn't taken for a ticket id.
+@router.get("/tickets/export")
+def export_tickets(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    department: Optional[str] = None,
+    queue: Optional[str] = None,
+    status: Optional[TicketStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    max_id = db.query(func.max(Ticket.id)).scalar() or 0
+    chunks = export_chunks(export_filters(department, queue, status, since, until), max_id)
+    filename = f"tickets-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{format}"
+    if format == "csv":
+        body, media_type = export_csv(chunks), "text/csv"
+    else:
+        body, media_type = export_ndjson(chunks), "application/x-ndjson"
+    # A sync generator: Starlette iterates it in the threadpool, off the event loop
+    return StreamingResponse(
+        body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Full ticket including body and generated reply
+@router.get("/tickets/{ticket_id}", response_model=TicketDetail)
+def get_ticket(ticket_id: int, db: Session = Depends(get_db)):
+    ticket = db.get(Ticket, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return ticket
+
+# Move a ticket to another status; its rollup counts move in the same transaction
+@router.patch("/tickets/{ticket_id}/status", response_model=TicketDetail)
+def update_ticket_status(ticket_id: int, request: TicketStatusUpdate, db: Session = Depends(get_db)):
+    ticket = db.query(Ticket).filter(Ticket.id == ticket_id).with_for_update().first()
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    if ticket.status != request.status:
+        deltas = Counter()
+        old_key = ticket_key(ticket)
+        ticket.status = request.status
+        record_move(deltas, old_key, ticket_key(ticket))
+        apply_deltas(db, deltas)
+        db.commit()
+        db.refresh(ticket)
+    return ticket
+
+# Model registry (admin). Activating a version loads and warms it in the background, swaps it
+# in without dropping requests, and updates registry/CURRENT so other workers follow.
+@router.get("/admin/models")
+def get_models():
+    return {
+        "active": classifier_service.model_version,
+        "current": current_version(),
+        "versions": list_versions(),
+    }
+
+@router.post("/admin/models/{version}/activate")
+async def activate_model(version: str):
+    if version not in list_versions():
+        raise HTTPException(status_code=404, detail=f"Unknown model version '{version}'")
+    await run_inference(classifier_service.swap, version)
+    await run_in_threadpool(set_current, version)
+    return {"active": classifier_service.model_version}
+
+# Keyword pre-filter rules (admin): reload keyword_rules.json without a restart, or see which rule fires
+@router.post("/admin/keyword-rules/reload")
+def reload_keyword_rules():
+    try:
+        version = classifier_service.rules.reload()
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Rules not reloaded: {e}")
+    return {"version": version}
+
+@router.post("/admin/keyword-rules/test")
+def test_keyword_rules(request: RuleTestRequest):
+    match = classifier_service.keyword_match(request.text)
+    return {"version": classifier_service.rules.version, "match": match.to_dict() if match else None}
+
+# Opt-in sampling profiler (PROFILER_ENABLED=true): samples every thread's stack for `seconds`
+# and returns collapsed stacks for flamegraph.pl / speedscope
+@router.get("/admin/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0, le=120),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    include_idle: bool = False,
+    limit: Optional[int] = Query(None, ge=1)
+):
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled (set PROFILER_ENABLED=true)")
+    profiler = SamplingProfiler(interval_ms, include_idle)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    return PlainTextResponse(profiler.collapsed(limit), headers={"X-Profile-Samples": str(profiler.samples)})
 
 # Initialize default users (for development)
 @router.post("/init-users")
-async def initialize_users(db: Session = Depends(get_db)):
+def initialize_users(db: Session = Depends(get_db)):
     """Create default users if they don't exist"""
     default_users = [
         {"username": "admin", "password": "admin123", "full_name": "System Administrator", "role": UserRole.ADMIN},
@@ -0,0 +1,12 @@
+# Department that handles each predicted queue (queues not listed go to sales).
+# Kept free of side effects so offline jobs (training/reclassify.py) can import it without app.api.
+DEPARTMENT_MAPPING = {
+    "Technical Support": "technical_support",
+    "IT Support": "technical_support",
+    "Product Support": "technical_support",
+    "Billing and Payments": "accounting",
+    "Returns and Exchanges": "accounting",
+    "Sales and Pre-Sales": "sales",
+    "Customer Service": "sales",
+    "General Inquiry": "sales"
+}
@@ -1,9 +1,35 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .db import engine, Base
-from .api import router as api_router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import inspect, text
+from .db import engine, Base, SessionLocal, upgrade_schema
+from .api import (
+    router as api_router, classifier_batcher, classifier_service, duplicate_index, embedding_batcher,
+    gemini_service, reply_pipeline,
+)
+from .services.metrics import Collected, TimingMiddleware, render as render_metrics
+from .services.embedding_index import DUPLICATE_INDEX_PATH
+from .models import TicketRollup
+from .services.rollups import backfill as backfill_rollups
+from .services.executors import configure_threadpool, run_inference, shutdown_pools
+from .services.model_registry import current_version, current_mtime
+import os
+
+# Seconds between checks of registry/CURRENT for a new model version (0 disables hot-swap)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "30"))
 
+# Writes keep ticket_rollups current, so a database that had tickets before the table existed
+# needs them counted once, when create_all adds it
+new_rollups = not inspect(engine).has_table(TicketRollup.__tablename__)
 Base.metadata.create_all(bind=engine)
+upgrade_schema()
+if new_rollups:
+    with SessionLocal() as db:
+        counted = backfill_rollups(db)
+        db.commit()
+    if counted:
+        print(f"📊 Counted {counted} existing ticket(s) into ticket_rollups")
 
 app = FastAPI(title="Ticket Auto-Classification System")
 
@@ -13,10 +39,107 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+# Request latency per route + Server-Timing header with the per-stage spans of each request
+app.add_middleware(TimingMiddleware)
+
 app.include_router(api_router, prefix="/api")
 
+def cache_counts(attribute):
+    caches = {
+        "classification_memory": classifier_service.cache,
+        "classification_disk": classifier_service.disk_cache,
+        "reply_summary": gemini_service.summary_cache,
+    }
+    return {(name,): getattr(cache, attribute) for name, cache in caches.items() if cache is not None}
+
+# Read at scrape time from the live objects
+Collected("classifier_queue_depth", "Tickets waiting for a classification batch", "gauge",
+          collect=lambda: {(): classifier_batcher.pending()})
+Collected("reply_queue_depth", "Tickets waiting for reply generation", "gauge",
+          collect=lambda: {(): reply_pipeline.pending()})
+Collected("llm_queue_depth", "LLM calls waiting for a concurrency slot", "gauge",
+          collect=lambda: {(): gemini_service.llm_pool.waiting})
+Collected("llm_in_flight", "LLM calls in progress", "gauge",
+          collect=lambda: {(): gemini_service.llm_pool.in_flight})
+Collected("llm_circuit_open", "1 while the LLM circuit breaker is open or half-open", "gauge",
+          collect=lambda: {(): int(gemini_service.llm_pool.breaker.state != "closed")})
+Collected("duplicate_index_size", "Recent tickets in the near-duplicate index", "gauge",
+          collect=lambda: {(): len(duplicate_index)} if duplicate_index is not None else {})
+Collected("cache_hits_total", "Cache hits", "counter", ["cache"], collect=lambda: cache_counts("hits"))
+Collected("cache_misses_total", "Cache misses", "counter", ["cache"], collect=lambda: cache_counts("misses"))
+
+async def prepare_classifier():
+    """Load (unless preloaded) and warm up the model without blocking startup"""
+    try:
+        if not classifier_service.loaded:
+            await run_inference(classifier_service.load)
+        await run_inference(classifier_service.warmup)
+        print("✅ Classifier model loaded and warmed up")
+    except Exception as e:
+        print(f"❌ Failed to load classifier model: {e}")
+
+async def watch_model_registry():
+    """Hot-swap the classifier when registry/CURRENT points at a different version"""
+    last_mtime = current_mtime()
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        mtime = current_mtime()
+        if mtime == last_mtime or not classifier_service.ready:
+            continue
+        last_mtime = mtime
+        version = current_version()
+        if version != classifier_service.model_version:
+            try:
+                await run_inference(classifier_service.swap, version)
+            except Exception as e:
+                print(f"❌ Failed to swap to model version {version}: {e}")
+
+@app.on_event("startup")
+async def startup():
+    configure_threadpool()
+    app.state.model_task = asyncio.create_task(prepare_classifier())
+    if MODEL_WATCH_INTERVAL > 0:
+        app.state.watch_task = asyncio.create_task(watch_model_registry())
+    reply_pipeline.start()
+    recovered = await reply_pipeline.recover()
+    if recovered:
+        print(f"🔁 Re-queued {recovered} ticket(s) awaiting a reply")
+
+@app.on_event("shutdown")
+async def shutdown():
+    await classifier_batcher.stop()
+    await embedding_batcher.stop()
+    await reply_pipeline.stop()
+    shutdown_pools()
+    if duplicate_index is not None and DUPLICATE_INDEX_PATH:
+        if not duplicate_index.save(DUPLICATE_INDEX_PATH):
+            print("🔎 Duplicate index not saved (empty, or another worker is saving it)")
+
+# Prometheus text format; values are per worker process
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Ticket Auto-Classification System API"}
+
+# Liveness: the process is up and serving. Readiness: the model is warm and the DB is reachable.
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    checks = {"model": classifier_service.ready}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        checks["database"] = True
+    except Exception:
+        checks["database"] = False
+    ready = all(checks.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "checks": checks})
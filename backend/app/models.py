@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Enum, Index
 from datetime import datetime
 from .db import Base
 import enum
@@ -15,6 +15,12 @@ class TicketStatus(str, enum.Enum):
     IN_PROGRESS = "in_progress"
     RESOLVED = "resolved"
 
+class ReplyStatus(str, enum.Enum):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -34,8 +40,35 @@ class Ticket(Base):
     client_name = Column(String, nullable=False)
     body = Column(Text, nullable=False)
     predicted_queue = Column(String, index=True)
+    # Registry version of the classifier that produced predicted_queue
+    model_version = Column(String, index=True)
     generated_reply = Column(Text)
+    reply_status = Column(Enum(ReplyStatus), default=ReplyStatus.PENDING, index=True)
+    reply_attempts = Column(Integer, default=0)
+    # When a reply worker claimed the ticket; other workers leave it alone until REPLY_LEASE_SECONDS pass
+    reply_claimed_at = Column(DateTime)
     status = Column(Enum(TicketStatus), default=TicketStatus.PENDING)
     assigned_department = Column(String, index=True)
+    # Earlier ticket this one was detected as a near-duplicate of (queue and reply reused from it)
+    parent_ticket_id = Column(Integer, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Composite indexes back the keyset-paginated listings: (filter, created_at) with id as tie-breaker
+    __table_args__ = (
+        Index("ix_tickets_created_at_id", "created_at", "id"),
+        Index("ix_tickets_department_created_at", "assigned_department", "created_at"),
+        Index("ix_tickets_client_created_at", "client_id", "created_at"),
+    )
+
+class TicketRollup(Base):
+    """Ticket counts per (department, queue, status, creation day), kept in step with `tickets`
+    in the same transaction as every insert, status change and reclassification (see
+    services/rollups.py). A missing department or queue is stored as ''."""
+    __tablename__ = "ticket_rollups"
+
+    assigned_department = Column(String, primary_key=True)
+    predicted_queue = Column(String, primary_key=True)
+    status = Column(Enum(TicketStatus), primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
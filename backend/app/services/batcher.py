@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from .executors import run_inference
+from .metrics import CLASSIFIER_BATCH_SIZE, ERRORS, detach_request, observe_stage
+
+
+class MicroBatcher:
+    """Collects concurrent classification requests into batches for a single forward pass.
+
+    Callers `await submit(text)` and get their own label back through a future.
+    A batch is flushed when it reaches `max_batch_size` or when the oldest request
+    has waited `max_latency_ms`, whichever comes first.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=None, max_latency_ms=None):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size or int(os.getenv("CLASSIFIER_MAX_BATCH_SIZE", "16"))
+        self.max_latency = (max_latency_ms if max_latency_ms is not None
+                            else float(os.getenv("CLASSIFIER_MAX_LATENCY_MS", "10"))) / 1000.0
+        self._queue = None
+        self._worker = None
+
+    def _ensure_started(self):
+        # The queue must be created inside the running event loop
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, text):
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        # Block for the first item, then fill the batch until size or deadline is hit
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        # Started from whichever request came first - don't attribute later batches to it
+        detach_request()
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _, _ in batch]
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                observe_stage("batch_wait", started - queued_at)
+            CLASSIFIER_BATCH_SIZE.observe(len(batch))
+            try:
+                # Run the forward pass on the inference pool so other requests keep flowing
+                labels = await run_inference(self.predict_batch, texts)
+            except Exception as e:
+                ERRORS.inc(stage="classify")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future, _), label in zip(batch, labels):
+                if not future.done():
+                    future.set_result(label)
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
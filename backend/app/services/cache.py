@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Lowercase and strip punctuation/extra whitespace so near-identical tickets share a key.
+
+    Digits are kept: cached values may quote order or invoice numbers, which must not
+    leak into another customer's reply.
+    """
+    text = text.lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_key(text, *parts):
+    """Stable hash of the normalized text plus any extra key parts (queue, model version...)"""
+    digest = hashlib.sha1(normalize_text(text).encode("utf-8"))
+    for part in parts:
+        digest.update(b"\0" + str(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with an optional per-entry time-to-live and hit/miss counters"""
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SQLiteCache:
+    """Persistent key -> JSON value cache in a SQLite file, shared by every worker process on the box.
+
+    Each entry carries a `tag` (e.g. the model version) so stale entries can be dropped in bulk.
+    The table is pruned back to `max_rows` (oldest first) every `prune_every` writes.
+    """
+
+    def __init__(self, path, max_rows=1000000, prune_every=1000):
+        self.path = path
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Throwaway connection: per-thread connections are opened lazily, after any fork
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, tag TEXT, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_created_at ON cache (created_at)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads - one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn().execute(f"SELECT key, value FROM cache WHERE key IN ({placeholders})", list(keys)).fetchall()
+        found = {key: json.loads(value) for key, value in rows}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items, tag=None):
+        if not items:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO cache (key, tag, value, created_at) VALUES (?, ?, ?, ?)",
+            [(key, tag, json.dumps(value), now) for key, value in items.items()]
+        )
+        conn.commit()
+        self._writes += len(items)
+        if self._writes >= self.prune_every:
+            self._writes = 0
+            self.prune()
+
+    def prune(self):
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        )
+        conn.commit()
+
+    def drop_other_tags(self, tag):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE tag IS NOT ?", (tag,))
+        conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        size = self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {
+            "path": self.path,
+            "size": size,
+            "max_rows": self.max_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
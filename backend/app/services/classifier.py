@@ -1,76 +1,348 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoTokenizer
+import numpy as np
 import pickle
 import os
+import time
+import threading
+from .inference_backends import load_backend
+from .model_registry import current_version, version_path
+from .cache import TTLCache, SQLiteCache, text_key
+from .keyword_rules import KeywordRuleEngine
+from .linear_model import FirstStageModel, FIRST_STAGE_MODEL
+from .tokenization import encode, length_buckets, pad_batch, pool_logits, config_key
+from .metrics import TICKETS_CLASSIFIED, observe_stage, span
 
-class TicketClassifierService:
-    def __init__(self):
-        # Current file is in backend/app/services/classifier.py
-        # We want to reach backend/training/
-        app_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # backend/app
-        backend_path = os.path.dirname(app_path) # backend
-        training_path = os.path.join(backend_path, 'training')
-        model_path = os.path.join(training_path, 'models', 'fine_tuned_bert')
-        
-        # Load the fine-tuned BERT model and tokenizer
+WARMUP_TEXT = "warm up ticket for the classifier " * 8
+
+class LoadedModel:
+    """Tokenizer, inference backend and label encoder of one model version - swapped as a unit"""
+
+    def __init__(self, model_path, version, backend_name=None):
+        self.model_path = model_path
+        self.version = version
+        # Load the fine-tuned BERT tokenizer and the configured inference backend
+        # (CLASSIFIER_BACKEND=torch|int8|onnx)
         # local_files_only=True ensures paths with spaces work correctly
         self.tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+        self.backend = load_backend(model_path, backend_name)
         
         # Load the label encoder from the model directory (same location as model weights)
         with open(os.path.join(model_path, 'label_encoder.pkl'), 'rb') as f:
             self.label_encoder = pickle.load(f)
-            
-        self.model.eval()
+        
+        # Optional first stage of the cascade (training/train_linear.py)
+        first_stage_path = os.path.join(model_path, FIRST_STAGE_MODEL)
+        self.first_stage = FirstStageModel.load(first_stage_path) if os.path.exists(first_stage_path) else None
+        # A first stage trained on other queues would answer with labels BERT never predicts
+        if self.first_stage is not None and list(self.first_stage.classes_) != list(self.label_encoder.classes_):
+            print(f"⚠️ {FIRST_STAGE_MODEL} in {version} was trained on other queues than label_encoder.pkl - "
+                  f"ignoring it (retrain with training/train_linear.py)")
+            self.first_stage = None
 
-    def predict(self, text):
-        # First, check for obvious sales intent using keywords
-        # This handles cases where the BERT model might misclassify based on tech keywords
-        text_lower = text.lower()
+    def logits(self, texts):
+        """Raw model logits for a list of texts (no keyword pre-filter)"""
+        return self._forward(texts, embeddings=False)[0]
+
+    def logits_and_embeddings(self, texts):
+        """Logits and L2-normalized mean-pooled encoder embeddings, one row each per text,
+        from the same forward pass (backends with `embeddings = True` only)"""
+        return self._forward(texts, embeddings=True)
+
+    def _forward(self, texts, embeddings):
+        # Tokenize without padding, then run similar-length chunks together so short tickets
+        # are only padded to their own bucket's longest row (see tokenization.py)
+        if not texts:
+            return np.zeros((0, len(self.label_encoder.classes_)), dtype=np.float32), None
+        start = time.perf_counter()
+        chunks, owners = encode(self.tokenizer, texts)
+        lengths = [len(ids) for ids in chunks]
+        tokenize_seconds = time.perf_counter() - start
+        inference_seconds = 0.0
+        chunk_logits = chunk_embeddings = None
+        for bucket in length_buckets(lengths):
+            start = time.perf_counter()
+            inputs = pad_batch(self.tokenizer, [chunks[i] for i in bucket], self.backend.return_tensors)
+            padded = time.perf_counter()
+            if embeddings:
+                bucket_logits, bucket_embeddings = self.backend.logits_and_embeddings(inputs)
+            else:
+                bucket_logits = self.backend.logits(inputs)
+            tokenize_seconds += padded - start
+            inference_seconds += time.perf_counter() - padded
+            if chunk_logits is None:
+                chunk_logits = np.empty((len(chunks), bucket_logits.shape[1]), dtype=bucket_logits.dtype)
+                if embeddings:
+                    chunk_embeddings = np.empty((len(chunks), bucket_embeddings.shape[1]), dtype=np.float32)
+            chunk_logits[bucket] = bucket_logits
+            if embeddings:
+                chunk_embeddings[bucket] = bucket_embeddings
+        observe_stage("tokenize", tokenize_seconds)
+        observe_stage("inference", inference_seconds)
+        # Long tickets in window mode have several chunks - pool them back to one row per ticket
+        logits = pool_logits(chunk_logits, owners, len(texts))
+        if not embeddings:
+            return logits, None
+        pooled = pool_logits(chunk_embeddings, owners, len(texts), pooling="mean")
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return logits, pooled
+
+    def warmup(self, batch_sizes=(1, 8)):
+        """Run dummy batches so the first real request doesn't pay for lazy init and allocator growth"""
+        for batch_size in batch_sizes:
+            self.logits([WARMUP_TEXT] * batch_size)
+
+
+class TicketClassifierService:
+    def __init__(self, backend=None, model_path=None, load=True):
+        # By default the served model comes from the versioned registry in backend/training/models
+        # (see model_registry.py); model_path pins a specific model directory instead
+        self.model_path = model_path
+        self.backend_name = backend
+        self.model = None
+        # Set once the model is loaded and warmed up - drives /health/ready
+        self.ready = False
+        self._swap_lock = threading.Lock()
+        self.rules = KeywordRuleEngine()
         
-        # Sales intent keywords - presence of these with purchase context = Sales
-        sales_keywords = [
-            'buy', 'purchase', 'order', 'pricing', 'price', 'quote', 
-            'interested in buying', 'would like to buy', 'want to buy',
-            'looking to purchase', 'need to order', 'how much does',
-            'cost of', 'available for sale', 'in stock', 'can i get',
-            'interested in purchasing', 'like to order', 'place an order'
-        ]
+        # Cascade: first-stage answers at or above this confidence skip BERT (>1 disables the first stage)
+        self.cascade_threshold = float(os.getenv("CASCADE_THRESHOLD", "0.9"))
+        self.stage_counts = {}
+        self._stats_lock = threading.Lock()
         
-        # Check for sales intent
-        has_sales_intent = any(keyword in text_lower for keyword in sales_keywords)
+        # Result cache: normalized-text hash + model version -> (label, stage, confidence, logits).
+        # In-process LRU, plus an optional SQLite file shared by all workers on the box.
+        cache_size = int(os.getenv("CLASSIFIER_CACHE_SIZE", "10000"))
+        self.cache = TTLCache(maxsize=cache_size) if cache_size > 0 else None
+        disk_cache_path = os.getenv("CLASSIFIER_DISK_CACHE", "")
+        self.disk_cache = SQLiteCache(
+            disk_cache_path,
+            max_rows=int(os.getenv("CLASSIFIER_DISK_CACHE_MAX_ROWS", "1000000"))
+        ) if disk_cache_path else None
         
-        # If has sales intent AND doesn't have clear problem indicators, classify as Sales
-        problem_indicators = [
-            'not working', 'broken', 'error', 'issue', 'problem', 'failed', 
-            'crash', 'bug', 'fix', 'help me fix', 'stopped working', 
-            'doesn\'t work', 'won\'t start', 'can\'t access'
-        ]
-        has_problem = any(indicator in text_lower for indicator in problem_indicators)
+        if load:
+            self.load()
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    @property
+    def model_version(self):
+        return self.model.version if self.model else None
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def backend(self):
+        return self.model.backend
+
+    @property
+    def label_encoder(self):
+        return self.model.label_encoder
+
+    def _load_model(self, version=None):
+        if self.model_path and version is None:
+            return LoadedModel(self.model_path, os.path.basename(self.model_path.rstrip(os.sep)), self.backend_name)
+        version = version or current_version()
+        return LoadedModel(version_path(version), version, self.backend_name)
+
+    def load(self, version=None):
+        self.model = self._load_model(version)
+
+    def warmup(self):
+        self.model.warmup()
+        self.ready = True
+
+    def swap(self, version):
+        """Load and warm `version` alongside the live model, then switch over in one assignment.
+
+        Batches already running keep the model object they started with, so nothing in flight is dropped.
+        """
+        with self._swap_lock:
+            model = self._load_model(version)
+            model.warmup()
+            self.model = model
+            self.invalidate_cache()
+        print(f"🔄 Now serving model version {version}")
+        return version
+
+    def invalidate_cache(self):
+        """Drop cached results from other model versions (their keys can no longer match anyway)"""
+        if self.cache:
+            self.cache.clear()
+        if self.disk_cache:
+            self.disk_cache.drop_other_tags(self.model_version)
+
+    def cache_stats(self):
+        return {
+            "memory": self.cache.stats() if self.cache else None,
+            "disk": self.disk_cache.stats() if self.disk_cache else None,
+        }
+
+    def logits(self, texts):
+        return self.model.logits(texts)
+
+    def keyword_match(self, text):
+        # First, check for obvious intent using the keyword rules (keyword_rules.json)
+        # This handles cases where the BERT model might misclassify based on tech keywords
+        return self.rules.match(text)
+
+    def keyword_label(self, text):
+        match = self.keyword_match(text)
+        return match.label if match else None
+
+    def _cached_results(self, keys):
+        """Look keys up in memory, then on disk; returns {index: result}"""
+        found = {}
+        missing = []
+        for i, key in enumerate(keys):
+            hit = self.cache.get(key) if self.cache else None
+            if hit is not None and len(hit) == 4:
+                found[i] = hit
+            else:
+                missing.append(i)
+        if self.disk_cache and missing:
+            disk_hits = self.disk_cache.get_many([keys[i] for i in missing])
+            for i in missing:
+                hit = disk_hits.get(keys[i])
+                # Entries written before the cascade (label, logits) are recomputed
+                if hit is not None and len(hit) == 4:
+                    found[i] = tuple(hit)
+                    if self.cache:
+                        self.cache.set(keys[i], found[i])
+        return found
+
+    def _store_results(self, entries, version):
+        if self.cache:
+            for key, result in entries.items():
+                self.cache.set(key, result)
+        if self.disk_cache:
+            self.disk_cache.set_many(entries, tag=version)
+
+    def _count_stages(self, stages):
+        with self._stats_lock:
+            for stage in stages:
+                self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+
+    def stage_stats(self):
+        counts = dict(self.stage_counts)
+        cascaded = counts.get("linear", 0) + counts.get("bert", 0)
+        return {
+            "counts": counts,
+            "cascade_threshold": self.cascade_threshold,
+            "first_stage_loaded": bool(self.model and self.model.first_stage),
+            # Share of tickets reaching the cascade that the first stage wasn't sure about
+            "escalation_rate": round(counts.get("bert", 0) / cascaded, 4) if cascaded else None,
+        }
+
+    def predict_batch_detailed(self, texts, model=None, precomputed_logits=None):
+        """Classify a list of tickets; returns one dict per ticket with the label, model version,
+        the stage that answered (cache / keyword / linear / bert) and its confidence.
+
+        Cached tickets are answered without running any model. The rest go through the keyword
+        pre-filter, then the first-stage linear model, and only tickets it isn't confident about
+        (below CASCADE_THRESHOLD) reach BERT, in a single padded forward pass.
+        The model is read once, so every label in the batch comes from the same version even mid-swap.
+        `precomputed_logits` (rows of `model.logits(texts)`) stands in for that forward pass.
+        """
+        model = model or self.model
+        use_cache = self.cache is not None or self.disk_cache is not None
+        # Rules version is part of the key so a rules reload can't serve stale keyword decisions,
+        # and the tokenization settings because max length / windowing change the model's answer
+        input_config = config_key()
+        keys = [text_key(text, model.version, self.rules.version, input_config) for text in texts] if use_cache else []
+        # result = (label, stage, confidence, logits)
+        with span("cache_lookup"):
+            results = self._cached_results(keys) if use_cache else {}
+        cached = set(results)
+
+        # Identical tickets within the batch are classified once
+        first_index = {}
+        duplicates = {}
+        todo = []
+        for i in range(len(texts)):
+            if i in results:
+                continue
+            if use_cache and keys[i] in first_index:
+                duplicates[i] = first_index[keys[i]]
+                continue
+            if use_cache:
+                first_index[keys[i]] = i
+            todo.append(i)
         
-        if has_sales_intent and not has_problem:
-            return "Sales and Pre-Sales"
+        computed = {}
+        with span("keyword_filter"):
+            for i in todo:
+                label = self.keyword_label(texts[i])
+                if label is not None:
+                    computed[i] = (label, "keyword", None, None)
         
-        # Fall back to BERT model for other cases
-        # Preprocess text
-        inputs = self.tokenizer(
-            text, 
-            return_tensors="pt", 
-            truncation=True, 
-            padding=True, 
-            max_length=128
-        )
+        # Cheap first stage: keep its answer when it is confident enough
+        pending = [i for i in todo if i not in computed]
+        if pending and model.first_stage is not None and self.cascade_threshold <= 1:
+            with span("first_stage"):
+                labels, confidences = model.first_stage.predict_with_confidence([texts[i] for i in pending])
+            for i, label, confidence in zip(pending, labels, confidences.tolist()):
+                if confidence >= self.cascade_threshold:
+                    computed[i] = (str(label), "linear", round(confidence, 4), None)
+            pending = [i for i in pending if i not in computed]
         
-        # Inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
+        # Fall back to BERT model for everything else
+        if pending:
+            # Inference
+            if precomputed_logits is not None:
+                logits = precomputed_logits[pending]
+            else:
+                logits = model.logits([texts[i] for i in pending])
+            
+            # Get the predicted class indices and decode the class labels
+            predicted_class_ids = logits.argmax(axis=1).tolist()
+            predicted_labels = model.label_encoder.inverse_transform(predicted_class_ids)
+            shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+            confidences = (shifted.max(axis=1) / shifted.sum(axis=1)).tolist()
             
-        # Get the predicted class index
-        predicted_class_id = torch.argmax(logits, dim=1).item()
+            for i, label, confidence, row in zip(pending, predicted_labels, confidences, logits.tolist()):
+                computed[i] = (str(label), "bert", round(confidence, 4), [round(value, 4) for value in row])
         
-        # Decode the class label
-        predicted_label = self.label_encoder.inverse_transform([predicted_class_id])[0]
+        if use_cache and computed:
+            self._store_results({keys[i]: result for i, result in computed.items()}, model.version)
+        results.update(computed)
+        for i, original in duplicates.items():
+            results[i] = results[original]
         
-        return predicted_label
+        detailed = []
+        for i in range(len(texts)):
+            label, stage, confidence, _ = results[i]
+            if i in cached or i in duplicates:
+                stage = "cache"
+            detailed.append({"label": label, "model_version": model.version, "stage": stage, "confidence": confidence})
+        self._count_stages(result["stage"] for result in detailed)
+        for result in detailed:
+            TICKETS_CLASSIFIED.inc(queue=result["label"], stage=result["stage"])
+        return detailed
 
+    def predict_batch_with_version(self, texts):
+        """(label, model_version) pairs - see predict_batch_detailed"""
+        return [(result["label"], result["model_version"]) for result in self.predict_batch_detailed(texts)]
+
+    def predict_batch_embedded(self, texts):
+        """(label, model_version, embedding) per ticket, for duplicate detection.
+
+        One encoder pass over every ticket gives the embeddings, and its logits answer the tickets
+        the cascade sends to BERT, so nothing is encoded twice. The embedding is None when the
+        backend can't produce one (onnx).
+        """
+        model = self.model
+        if not model.backend.embeddings:
+            return [(label, version, None) for label, version in self.predict_batch_with_version(texts)]
+        logits, embeddings = model.logits_and_embeddings(texts)
+        detailed = self.predict_batch_detailed(texts, model=model, precomputed_logits=logits)
+        return [(result["label"], result["model_version"], embedding) for result, embedding in zip(detailed, embeddings)]
+
+    def predict_batch(self, texts):
+        return [label for label, _ in self.predict_batch_with_version(texts)]
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
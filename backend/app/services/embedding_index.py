@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, concurrent saves are not serialized
+    fcntl = None
+
+# Near-duplicate detection at ingest (see predict_ticket): tickets whose encoder embedding is at least
+# DUPLICATE_THRESHOLD cosine-similar to a ticket from the last DUPLICATE_WINDOW_HOURS reuse its queue
+# and reply and are linked to it as their parent
+DUPLICATE_DETECTION = os.getenv("DUPLICATE_DETECTION", "false").lower() == "true"
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.95"))
+DUPLICATE_WINDOW_HOURS = float(os.getenv("DUPLICATE_WINDOW_HOURS", "24"))
+# Most recent tickets kept per worker process (768 float32 per ticket: ~3 KB each)
+DUPLICATE_INDEX_SIZE = int(os.getenv("DUPLICATE_INDEX_SIZE", "20000"))
+# Loaded at startup and written at shutdown ("" keeps the index in memory only). Every worker process
+# loads the same file; at shutdown one worker at a time replaces it with its own index.
+DUPLICATE_INDEX_PATH = os.getenv("DUPLICATE_INDEX_PATH", "./duplicate_index.npz")
+# From this many tickets on, search only the vectors in the DUPLICATE_ANN_PROBES clusters closest to the
+# query (inverted file over spherical k-means centroids) instead of every vector
+DUPLICATE_ANN_MIN_SIZE = int(os.getenv("DUPLICATE_ANN_MIN_SIZE", "10000"))
+DUPLICATE_ANN_CLUSTERS = int(os.getenv("DUPLICATE_ANN_CLUSTERS", "64"))
+DUPLICATE_ANN_PROBES = int(os.getenv("DUPLICATE_ANN_PROBES", "8"))
+
+KMEANS_SAMPLE = 5000
+KMEANS_ITERATIONS = 8
+
+
+class DuplicateMatch:
+    def __init__(self, ticket_id, ticket_number, queue, score):
+        self.ticket_id = ticket_id
+        self.ticket_number = ticket_number
+        self.queue = queue
+        self.score = score
+
+
+class EmbeddingIndex:
+    """Ring buffer of the most recent tickets' normalized embeddings, searched by inner product.
+
+    Only tickets that were not duplicates themselves are added, so every match is a root ticket.
+    Embeddings from different model versions aren't comparable: adding one from a new version
+    empties the index, and searches with another version find nothing.
+    """
+
+    def __init__(self, capacity=DUPLICATE_INDEX_SIZE, threshold=DUPLICATE_THRESHOLD,
+                 window_hours=DUPLICATE_WINDOW_HOURS, ann_min_size=DUPLICATE_ANN_MIN_SIZE,
+                 clusters=DUPLICATE_ANN_CLUSTERS, probes=DUPLICATE_ANN_PROBES):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.window = window_hours * 3600
+        self.ann_min_size = ann_min_size
+        self.clusters = clusters
+        self.probes = probes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._reset(None)
+
+    def _reset(self, version):
+        self.version = version
+        self.size = 0
+        self.next = 0
+        self.vectors = None  # (capacity, dim) float32, allocated on the first add
+        self.ticket_ids = np.zeros(self.capacity, dtype=np.int64)
+        self.ticket_numbers = [None] * self.capacity
+        self.queues = [None] * self.capacity
+        self.added_at = np.zeros(self.capacity, dtype=np.float64)
+        self.centroids = None
+        self.assignments = np.full(self.capacity, -1, dtype=np.int32)
+        self._adds_since_training = 0
+
+    def __len__(self):
+        return self.size
+
+    def search(self, vector, version, now=None):
+        """Most similar recent ticket at or above the threshold, or None"""
+        now = now or time.time()
+        with self._lock:
+            if version != self.version or self.size == 0:
+                self.misses += 1
+                return None
+            if self.centroids is None:
+                candidates = np.arange(self.size)
+                scores = self.vectors[:self.size] @ vector
+            else:
+                k = min(self.probes, len(self.centroids))
+                probes = np.argpartition(self.centroids @ vector, -k)[-k:]
+                candidates = np.flatnonzero(np.isin(self.assignments[:self.size], probes))
+                scores = self.vectors[candidates] @ vector
+            scores[self.added_at[candidates] < now - self.window] = -1.0
+            if not len(scores) or scores.max() < self.threshold:
+                self.misses += 1
+                return None
+            best = int(candidates[scores.argmax()])
+            self.hits += 1
+            return DuplicateMatch(
+                int(self.ticket_ids[best]), self.ticket_numbers[best], self.queues[best], round(float(scores.max()), 4)
+            )
+
+    def add(self, ticket_id, ticket_number, queue, vector, version, added_at=None):
+        with self._lock:
+            if version != self.version:
+                self._reset(version)
+            if self.vectors is None:
+                self.vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+            slot = self.next
+            self.vectors[slot] = vector
+            self.ticket_ids[slot] = ticket_id
+            self.ticket_numbers[slot] = ticket_number
+            self.queues[slot] = queue
+            self.added_at[slot] = added_at or time.time()
+            if self.centroids is not None:
+                self.assignments[slot] = int((self.centroids @ vector).argmax())
+            self.next = (slot + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            self._adds_since_training += 1
+            # (Re)build the clusters once the index is big enough, and again whenever it has
+            # taken in half as many new tickets as it held at the last build
+            if self.size >= self.ann_min_size and (
+                self.centroids is None or self._adds_since_training >= self.size // 2
+            ):
+                self._train()
+
+    def _train(self):
+        """Spherical k-means on a sample, then assign every stored vector to its closest centroid"""
+        rng = np.random.default_rng(0)
+        sample = self.vectors[rng.choice(self.size, min(self.size, KMEANS_SAMPLE), replace=False)]
+        k = min(self.clusters, len(sample))
+        centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            nearest = (sample @ centroids.T).argmax(axis=1)
+            for cluster in range(k):
+                members = sample[nearest == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        self.centroids = centroids
+        self.assignments[:self.size] = (self.vectors[:self.size] @ centroids.T).argmax(axis=1)
+        self._adds_since_training = 0
+
+    def _chronological(self):
+        if self.size < self.capacity:
+            return np.arange(self.size)
+        return (self.next + np.arange(self.capacity)) % self.capacity
+
+    def save(self, path):
+        """Write the entries oldest first (atomically); the clusters are rebuilt on load.
+        Returns False if another process is saving to `path` right now (this index is then dropped)."""
+        with self._lock:
+            if self.vectors is None:
+                return False
+            order = self._chronological()
+            arrays = {
+                "version": np.array(self.version),
+                "vectors": self.vectors[order],
+                "ticket_ids": self.ticket_ids[order],
+                "ticket_numbers": np.array([self.ticket_numbers[i] for i in order]),
+                "queues": np.array([self.queues[i] for i in order]),
+                "added_at": self.added_at[order],
+            }
+        with open(path + ".lock", "w") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        return True
+
+    def load(self, path):
+        """Restore saved entries (the newest `capacity` if the index got smaller); returns the count"""
+        if not path or not os.path.exists(path):
+            return 0
+        with np.load(path, allow_pickle=False) as data:
+            version = str(data["version"])
+            vectors = data["vectors"][-self.capacity:]
+            ticket_ids = data["ticket_ids"][-self.capacity:]
+            ticket_numbers = data["ticket_numbers"][-self.capacity:].tolist()
+            queues = data["queues"][-self.capacity:].tolist()
+            added_at = data["added_at"][-self.capacity:]
+        count = len(ticket_ids)
+        with self._lock:
+            self._reset(version)
+            self.vectors = np.zeros((self.capacity, vectors.shape[1]), dtype=np.float32)
+            self.vectors[:count] = vectors
+            self.ticket_ids[:count] = ticket_ids
+            self.ticket_numbers[:count] = ticket_numbers
+            self.queues[:count] = queues
+            self.added_at[:count] = added_at
+            self.size = count
+            self.next = count % self.capacity
+            if self.size >= self.ann_min_size:
+                self._train()
+        return count
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": self.size,
+            "capacity": self.capacity,
+            "model_version": self.version,
+            "approximate": self.centroids is not None,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,28 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from anyio import to_thread
+
+# Pool sizes - tune per worker process
+# INFERENCE_WORKERS: threads running model forward passes (torch already parallelises each pass)
+# THREADPOOL_SIZE: threads for sync handlers and SQLAlchemy calls (FastAPI/anyio default threadpool)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
+inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+
+def configure_threadpool():
+    """Resize the anyio threadpool used for `def` endpoints and run_in_threadpool; call from the event loop"""
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Run CPU-bound model code on the bounded inference pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_pool, partial(fn, *args, **kwargs))
+
+
+def shutdown_pools():
+    inference_pool.shutdown(wait=False, cancel_futures=True)
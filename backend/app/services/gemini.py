@@ -1,21 +1,110 @@
+import asyncio
 import os
+import random
+import re
 from pathlib import Path
 from google import genai
+from google.genai import types
 from dotenv import load_dotenv
+from .cache import TTLCache, text_key
+from .llm_client import LLM_TIMEOUT_SECONDS, CircuitOpenError, LLMClientPool
 
 # Load .env from backend directory
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# REPLY_MODE controls how much of the reply the LLM writes:
+#   template - render locally with an extractive summary, no LLM call at all
+#   summary  - LLM writes only the one-line issue summary, the template is rendered locally
+#   full     - LLM writes the whole reply (original behaviour)
+REPLY_MODES = ("template", "summary", "full")
+# Optional provider endpoint override, e.g. a local fake server (benchmarks/fake_llm_server.py)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+
+REPLY_TEMPLATE = """Subject: Regarding your recent {queue} issue - [Ticket Number - {ticket_number}]
+
+Dear {client_name},
+
+Thank you for reaching out to us. We understand your concern regarding {summary}.
+
+We sincerely apologize for any inconvenience this may cause. Please be assured that we are reviewing this issue and will investigate it immediately. We will be in touch with an update as soon as possible.
+
+Sincerely,
+Shanyan AI Bot
+Shanyan AI Customer Support"""
+
+GREETING_PATTERN = re.compile(
+    r"^(dear|hello|hi|hey|greetings|good (morning|afternoon|evening)|to whom it may concern)\b[^,.!?\n]*[,.!?\n]?\s*",
+    re.IGNORECASE
+)
+PLEASANTRY_PATTERN = re.compile(r"\b(hope (you|this)|thank(s| you)|how are you)\b", re.IGNORECASE)
+
+
+def render_reply(summary, predicted_queue, ticket_number, client_name):
+    return REPLY_TEMPLATE.format(
+        queue=predicted_queue.lower(),
+        ticket_number=ticket_number,
+        client_name=client_name,
+        summary=summary
+    )
+
+
+SUMMARY_PATTERN = re.compile(r"We understand your concern regarding (.+?)\.\n\nWe sincerely apologize", re.DOTALL)
+
+
+def extract_summary(reply):
+    """The issue summary inside a reply rendered from REPLY_TEMPLATE (or an LLM reply that kept
+    its format), so it can be re-rendered for another ticket; None if it isn't there"""
+    match = SUMMARY_PATTERN.search(reply or "")
+    return match.group(1).strip() if match else None
+
+
+def summarize_extractive(ticket_text, max_words=20):
+    """Pick the first sentence with real content (skipping greetings) as the issue summary"""
+    text = re.sub(r"\s+", " ", ticket_text).strip()
+    text = GREETING_PATTERN.sub("", text)
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", text) if s]
+    if not sentences:
+        return "your recent request"
+    sentence = next(
+        (s for s in sentences if len(s.split()) >= 4 and not PLEASANTRY_PATTERN.search(s)),
+        sentences[0]
+    )
+    words = sentence.rstrip(".!?").split()
+    snippet = " ".join(words[:max_words]) + ("..." if len(words) > max_words else "")
+    return f'your message: "{snippet}"'
+
+
+def clean_summary(text):
+    # Keep the first line and drop quotes/trailing punctuation the model may add
+    summary = text.strip().splitlines()[0] if text.strip() else ""
+    summary = summary.strip().strip('"\'').rstrip(".")
+    return summary or "your recent request"
+
+
 class GeminiService:
-    def __init__(self):
+    def __init__(self, mode=None):
+        self.mode = (mode or os.getenv("REPLY_MODE", "summary")).lower()
+        if self.mode not in REPLY_MODES:
+            raise ValueError(f"Unknown REPLY_MODE '{self.mode}', expected one of {REPLY_MODES}")
+        # The template fast path never calls the LLM, so it needs no API key
+        self.client = self._make_client() if self.mode != "template" else None
+        # Concurrency cap, deadlines, retries, circuit breaker and coalescing for the async calls
+        self.llm_pool = LLMClientPool()
+        # Issue summaries keyed on normalized ticket text + queue; the rest of the reply is per-ticket
+        ttl = float(os.getenv("REPLY_CACHE_TTL_SECONDS", "86400"))
+        self.summary_cache = TTLCache(maxsize=int(os.getenv("REPLY_CACHE_SIZE", "10000")), ttl=ttl or None)
+
+    def _make_client(self):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
-        self.client = genai.Client(api_key=api_key)
+        # Backstop for a single HTTP request; llm_pool enforces the per-attempt timeout itself
+        http_options = types.HttpOptions(timeout=int(LLM_TIMEOUT_SECONDS * 1000), base_url=LLM_BASE_URL)
+        return genai.Client(api_key=api_key, http_options=http_options)
 
-    def generate_reply(self, ticket_text, predicted_queue, ticket_number, client_name):
-        prompt = f"""
+    def build_prompt(self, ticket_text, predicted_queue, ticket_number, client_name):
+        return f"""
 You are Shanyan AI Bot, a customer support assistant for Shanyan AI company.
 
 Ticket Number: {ticket_number}
@@ -39,8 +128,113 @@ Shanyan AI Customer Support
 
 Do NOT add any additional text outside this format.
 """
-        response = self.client.models.generate_content(
-            model='gemma-3-27b-it',
-            contents=prompt
-        )
+
+    def build_summary_prompt(self, ticket_text, predicted_queue):
+        return f"""
+You are Shanyan AI Bot, a customer support assistant for Shanyan AI company.
+
+Ticket Category: {predicted_queue}
+Customer Message: {ticket_text}
+
+Summarize the customer's issue as a short noun phrase (at most 15 words) that completes the sentence
+"We understand your concern regarding ...".
+
+Reply with the phrase only - no quotes, no trailing period, no other text.
+"""
+
+    # LLM calls - overridden by StubGeminiService
+
+    async def _asummary_call(self, prompt):
+        response = await self.client.aio.models.generate_content(model='gemma-3-27b-it', contents=prompt)
+        return clean_summary(response.text)
+
+    async def _afull_reply_call(self, prompt):
+        response = await self.client.aio.models.generate_content(model='gemma-3-27b-it', contents=prompt)
         return response.text.strip()
+
+    async def allm_summary(self, ticket_text, predicted_queue):
+        prompt = self.build_summary_prompt(ticket_text, predicted_queue)
+        return await self.llm_pool.run("summary", prompt, lambda: self._asummary_call(prompt))
+
+    async def allm_full_reply(self, ticket_text, predicted_queue, ticket_number, client_name):
+        prompt = self.build_prompt(ticket_text, predicted_queue, ticket_number, client_name)
+        return await self.llm_pool.run("full", prompt, lambda: self._afull_reply_call(prompt))
+
+    # Public API
+
+    async def agenerate_reply(self, ticket_text, predicted_queue, ticket_number, client_name):
+        """Reply for a ticket; LLM calls go through llm_pool (async genai client).
+        While the LLM circuit is open, replies are rendered from the template (and not cached)."""
+        try:
+            if self.mode == "full":
+                return await self.allm_full_reply(ticket_text, predicted_queue, ticket_number, client_name)
+            key = text_key(ticket_text, predicted_queue)
+            summary = self.summary_cache.get(key)
+            if summary is None:
+                if self.mode == "template":
+                    summary = summarize_extractive(ticket_text)
+                else:
+                    summary = await self.allm_summary(ticket_text, predicted_queue)
+                self.summary_cache.set(key, summary)
+        except CircuitOpenError:
+            summary = summarize_extractive(ticket_text)
+        return render_reply(summary, predicted_queue, ticket_number, client_name)
+
+    def reuse_reply(self, parent_reply, ticket_text, predicted_queue, ticket_number, client_name):
+        """Reply for a near-duplicate ticket from its parent's reply: the parent's issue summary with
+        this ticket's number and customer name, no LLM call. None when it can't be reused - the
+        summary isn't found, or it mentions numbers (orders, invoices) this ticket doesn't have.
+        Template mode renders from the ticket's own text anyway, at no cost."""
+        if self.mode == "template":
+            return None
+        summary = extract_summary(parent_reply)
+        if summary is None or not set(re.findall(r"\d+", summary)) <= set(re.findall(r"\d+", ticket_text)):
+            return None
+        return render_reply(summary, predicted_queue, ticket_number, client_name)
+
+    def cache_stats(self):
+        return {"mode": self.mode, **self.summary_cache.stats(), "llm": self.llm_pool.stats()}
+
+
+class StubGeminiService(GeminiService):
+    """Offline stand-in for GeminiService (LLM_PROVIDER=stub) for local runs and tests.
+
+    STUB_LLM_DELAY_MS simulates provider latency and STUB_LLM_FAILURE_RATE makes a
+    fraction of calls raise, to exercise retries.
+    """
+
+    def __init__(self, mode=None, delay_ms=None, failure_rate=None):
+        self.delay = (delay_ms if delay_ms is not None else float(os.getenv("STUB_LLM_DELAY_MS", "0"))) / 1000.0
+        self.failure_rate = failure_rate if failure_rate is not None else float(os.getenv("STUB_LLM_FAILURE_RATE", "0"))
+        self.calls = 0
+        super().__init__(mode)
+
+    def _make_client(self):
+        return None
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if random.random() < self.failure_rate:
+            raise RuntimeError("Stub LLM failure")
+
+    async def allm_summary(self, ticket_text, predicted_queue):
+        prompt = self.build_summary_prompt(ticket_text, predicted_queue)
+        return await self.llm_pool.run("summary", prompt, lambda: self._astub_summary(ticket_text))
+
+    async def _astub_summary(self, ticket_text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self._maybe_fail()
+        return summarize_extractive(ticket_text)
+
+    async def allm_full_reply(self, ticket_text, predicted_queue, ticket_number, client_name):
+        prompt = self.build_prompt(ticket_text, predicted_queue, ticket_number, client_name)
+        summary = await self.llm_pool.run("full", prompt, lambda: self._astub_summary(ticket_text))
+        return render_reply(summary, predicted_queue, ticket_number, client_name)
+
+
+def get_gemini_service():
+    """LLM_PROVIDER=gemini (default) or stub"""
+    if os.getenv("LLM_PROVIDER", "gemini").lower() == "stub":
+        return StubGeminiService()
+    return GeminiService()
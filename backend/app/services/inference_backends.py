@@ -0,0 +1,115 @@
+import os
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification
+
+# Optimized artifacts are written next to label_encoder.pkl by training/export_model.py
+INT8_WEIGHTS = "model_int8.pt"
+ONNX_MODEL = "model.onnx"
+# Plain torch state dict loaded with mmap=True: weights stay backed by the file's page cache,
+# so every worker process on the box shares one physical copy
+MMAP_WEIGHTS = "model_mmap.pt"
+
+
+def _set_threads():
+    threads = int(os.getenv("CLASSIFIER_NUM_THREADS", "0"))
+    if threads:
+        torch.set_num_threads(threads)
+
+
+class TorchBackend:
+    """Full fp32 PyTorch model (the original serving path)"""
+    return_tensors = "pt"
+
+    def __init__(self, model_path):
+        _set_threads()
+        mmap_path = os.path.join(model_path, MMAP_WEIGHTS)
+        if os.path.exists(mmap_path):
+            config = AutoConfig.from_pretrained(model_path, local_files_only=True)
+            model = AutoModelForSequenceClassification.from_config(config)
+            # assign=True swaps the freshly initialised parameters for the mmap-backed tensors
+            state_dict = torch.load(mmap_path, mmap=True, weights_only=True, map_location="cpu")
+            model.load_state_dict(state_dict, assign=True)
+            self.model = model
+        else:
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+        self.model.eval()
+
+    # Can return encoder embeddings alongside the logits (duplicate detection)
+    embeddings = True
+
+    def logits(self, inputs):
+        with torch.no_grad():
+            return self.model(**inputs).logits.numpy()
+
+    def logits_and_embeddings(self, inputs):
+        """Logits plus the attention-masked mean of the last hidden layer, from one forward pass"""
+        with torch.no_grad():
+            outputs = self.model(**inputs, output_hidden_states=True)
+        hidden = outputs.hidden_states[-1]
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return outputs.logits.numpy(), pooled.numpy()
+
+
+class Int8Backend(TorchBackend):
+    """Dynamic int8 quantization of the Linear layers; runs on any CPU with no extra deps"""
+
+    def __init__(self, model_path):
+        _set_threads()
+        weights_path = os.path.join(model_path, INT8_WEIGHTS)
+        if os.path.exists(weights_path):
+            # Build the graph from config and load the exported int8 weights directly,
+            # so the fp32 weights never have to be resident in memory
+            config = AutoConfig.from_pretrained(model_path, local_files_only=True)
+            model = AutoModelForSequenceClassification.from_config(config)
+            model = quantize(model)
+            # export_model.py saves only the state dict (quantized tensors, dtypes), which the
+            # weights-only unpickler accepts - no arbitrary objects are unpickled
+            model.load_state_dict(torch.load(weights_path, weights_only=True, map_location="cpu"))
+        else:
+            print(f"⚠️ {INT8_WEIGHTS} not found, quantizing the fp32 model at startup")
+            model = quantize(AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True))
+        self.model = model
+        self.model.eval()
+
+
+class OnnxBackend:
+    """Exported ONNX graph executed by onnxruntime"""
+    return_tensors = "np"
+    # The exported graph only has the logits output
+    embeddings = False
+
+    def __init__(self, model_path):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = int(os.getenv("CLASSIFIER_NUM_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_path, ONNX_MODEL), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def logits(self, inputs):
+        feed = {name: value.astype("int64") for name, value in inputs.items() if name in self.input_names}
+        return self.session.run(["logits"], feed)[0]
+
+
+BACKENDS = {
+    "torch": TorchBackend,
+    "int8": Int8Backend,
+    "onnx": OnnxBackend,
+}
+
+
+def quantize(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_backend(model_path, name=None):
+    name = (name or os.getenv("CLASSIFIER_BACKEND", "torch")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown CLASSIFIER_BACKEND '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](model_path)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import re
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'keyword_rules.json')
+
+
+class RuleMatch:
+    def __init__(self, rule, label, phrases):
+        self.rule = rule
+        self.label = label
+        self.phrases = phrases
+
+    def to_dict(self):
+        return {"rule": self.rule, "label": self.label, "phrases": self.phrases}
+
+
+# Below this many phrases, C-level substring scans beat any single-pass regex in CPython
+REGEX_MIN_PHRASES = 64
+
+
+def trie_regex(phrases):
+    """Regex source for a prefix trie of `phrases` - shared prefixes are tested once per position"""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Prefer the longer phrase, but allow stopping here if a phrase ends at this node
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class CompiledRules:
+    """One immutable compiled rule set: every phrase of every rule found in a single scan"""
+
+    def __init__(self, rules, version):
+        self.rules = rules
+        self.version = version
+        self.phrases = sorted({p.lower() for rule in rules for p in rule.get("match_any", []) + rule.get("unless_any", [])})
+        self.pattern = None
+        # Phrases that are prefixes of another phrase (e.g. "fix" of "fixed") are hidden behind
+        # the longer match at that position, so each phrase maps to itself plus its prefixes
+        self.prefixes = {p: [q for q in self.phrases if p.startswith(q)] for p in self.phrases}
+        if len(self.phrases) >= REGEX_MIN_PHRASES:
+            # The lookahead lets matches overlap, keeping plain substring semantics
+            # (e.g. both "fix" and "help me fix", or "buy" inside "buying")
+            self.pattern = re.compile(f"(?=({trie_regex(self.phrases)}))")
+
+    def find_phrases(self, text):
+        text = text.lower()
+        if self.pattern is None:
+            return {p for p in self.phrases if p in text}
+        found = set()
+        for m in self.pattern.finditer(text):
+            found.update(self.prefixes[m.group(1)])
+        return found
+
+    def match(self, text):
+        found = self.find_phrases(text)
+        if not found:
+            return None
+        for rule in self.rules:
+            hits = [p for p in rule.get("match_any", []) if p.lower() in found]
+            if hits and not any(p.lower() in found for p in rule.get("unless_any", [])):
+                return RuleMatch(rule["name"], rule["label"], hits)
+        return None
+
+
+class KeywordRuleEngine:
+    """Keyword pre-filter rules loaded from a JSON file (KEYWORD_RULES_PATH) and reloadable at runtime.
+
+    Rules are evaluated in file order; the first rule with a `match_any` phrase present and no
+    `unless_any` phrase present fires. All phrases are found in one pass over the text.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("KEYWORD_RULES_PATH", DEFAULT_RULES_PATH)
+        self.compiled = None
+        self.reload()
+
+    @property
+    def version(self):
+        return self.compiled.version
+
+    def reload(self):
+        """Re-read and recompile the rules file; the old rules stay live if it is invalid"""
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        rules = json.loads(raw)["rules"]
+        for rule in rules:
+            if not rule.get("name") or not rule.get("label") or not rule.get("match_any"):
+                raise ValueError(f"Keyword rule needs name, label and match_any: {rule}")
+        # Swapped in with a single assignment, so concurrent matches see either the old or new set
+        self.compiled = CompiledRules(rules, hashlib.sha1(raw).hexdigest()[:12])
+        return self.compiled.version
+
+    def match(self, text):
+        return self.compiled.match(text)
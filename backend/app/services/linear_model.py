@@ -0,0 +1,47 @@
+import pickle
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+# Written next to label_encoder.pkl by training/train_linear.py
+FIRST_STAGE_MODEL = "linear_model.pkl"
+
+
+class FirstStageModel:
+    """Hashed bag-of-words (unigrams + bigrams) logistic regression - the cheap first stage of the cascade.
+
+    Hashing needs no vocabulary, so the model is just the weight matrix and classifies a
+    ticket in well under a millisecond on CPU.
+    """
+
+    def __init__(self, n_features=2 ** 18):
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            token_pattern=r"(?u)\b[a-zA-Z][a-zA-Z]+\b",
+        )
+        self.classifier = SGDClassifier(loss="log_loss", alpha=1e-6, max_iter=20, tol=None, random_state=42)
+
+    @property
+    def classes_(self):
+        return self.classifier.classes_
+
+    def fit(self, texts, labels):
+        self.classifier.fit(self.vectorizer.transform(texts), labels)
+        return self
+
+    def predict_with_confidence(self, texts):
+        """Returns (labels, confidences) where confidence is the top class probability"""
+        probabilities = self.classifier.predict_proba(self.vectorizer.transform(texts))
+        best = probabilities.argmax(axis=1)
+        return self.classifier.classes_[best], probabilities[np.arange(len(best)), best]
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
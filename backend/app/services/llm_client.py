@@ -0,0 +1,171 @@
+import asyncio
+import os
+import random
+import time
+from .metrics import LLM_CALL_SECONDS, LLM_REQUESTS, LLM_RETRIES
+
+# Managed access to the LLM provider, per worker process:
+#   - at most LLM_MAX_CONCURRENCY calls in flight, the rest wait in line (llm_queue_depth)
+#   - each attempt is cut off after LLM_TIMEOUT_SECONDS, and a request (queueing and retries
+#     included) after LLM_DEADLINE_SECONDS
+#   - failed attempts are retried up to LLM_MAX_ATTEMPTS with full-jitter exponential backoff
+#   - LLM_BREAKER_FAILURES consecutive failures open the circuit: requests fail fast with
+#     CircuitOpenError (callers fall back to the template reply) until a probe call succeeds,
+#     at most every LLM_BREAKER_RESET_SECONDS
+#   - identical prompts in flight at the same time share one provider call
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "45"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "2"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "0.5"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider is failing; the request was not sent"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker. Once open, the first request after `reset_seconds` is let
+    through as a probe (half-open): success closes the circuit, failure re-opens it."""
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, reset_seconds=LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+
+    def is_open(self):
+        """Requests would be rejected right now (no state change)"""
+        return self.state != CLOSED and time.monotonic() - self.opened_at < self.reset_seconds
+
+    def allow(self):
+        """Whether a call may go out now; after the reset period, lets one probe through
+        (again if the last probe never reported back)"""
+        if self.state == CLOSED:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = HALF_OPEN
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+                print(f"⚠️ LLM circuit open after {self.failures} consecutive failure(s)")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class LLMClientPool:
+    """Runs provider calls (`call()` coroutine factories) under the limits above"""
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT_SECONDS,
+                 deadline=LLM_DEADLINE_SECONDS, max_attempts=LLM_MAX_ATTEMPTS,
+                 backoff_base=LLM_RETRY_BACKOFF_SECONDS, breaker=None):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff_base = backoff_base
+        self.breaker = breaker or CircuitBreaker()
+        self.waiting = 0
+        self.in_flight = 0
+        self._semaphore = None
+        self._pending = {}
+
+    @property
+    def semaphore(self):
+        # Created on first use so it binds to the serving event loop, not the importing one
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, kind, key, call):
+        """Result of `call()`, shared with any identical (`key`) request already in flight.
+        Raises CircuitOpenError, asyncio.TimeoutError or the provider's last error."""
+        task = self._pending.get(key)
+        if task is not None:
+            LLM_REQUESTS.inc(kind=kind, result="coalesced")
+        else:
+            if self.breaker.is_open():
+                LLM_REQUESTS.inc(kind=kind, result="circuit_open")
+                raise CircuitOpenError("LLM circuit is open")
+            task = asyncio.ensure_future(asyncio.wait_for(self._attempts(kind, call), self.deadline))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # A caller that gives up must not cancel the call for the others sharing it
+        return await asyncio.shield(task)
+
+    async def _attempts(self, kind, call):
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1:
+                LLM_RETRIES.inc(kind=kind)
+            try:
+                result = await self._attempt(kind, call)
+                LLM_REQUESTS.inc(kind=kind, result="ok")
+                return result
+            except CircuitOpenError:
+                LLM_REQUESTS.inc(kind=kind, result="circuit_open")
+                raise
+            except Exception:
+                if attempt == self.max_attempts:
+                    LLM_REQUESTS.inc(kind=kind, result="failed")
+                    raise
+            await asyncio.sleep(random.uniform(0, self.backoff_base * 2 ** (attempt - 1)))
+
+    async def _attempt(self, kind, call):
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        # The circuit may have opened while this call waited for its slot
+        if not self.breaker.allow():
+            self.semaphore.release()
+            raise CircuitOpenError("LLM circuit opened while queued")
+        self.in_flight += 1
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(call(), self.timeout)
+            outcome = "ok"
+            self.breaker.record_success()
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            self.breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+            LLM_CALL_SECONDS.observe(time.perf_counter() - start, kind=kind, outcome=outcome)
+
+    def stats(self):
+        return {
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "coalescing": len(self._pending),
+            "max_concurrency": self.max_concurrency,
+        }
@@ -0,0 +1,198 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# In-process metrics rendered in the Prometheus text format at GET /metrics.
+# Each worker process keeps its own values; scrape every worker (or sum per instance).
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        lines = self.header()
+        for key, (counts, total, count) in values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Collected(Metric):
+    """Read at scrape time from state that already exists elsewhere (queue depths, cache counters).
+    `collect()` returns {label values tuple: value}."""
+
+    def __init__(self, name, help, type, labelnames=(), collect=None):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def render(self):
+        try:
+            values = self.collect() if self.collect else {}
+        except Exception:
+            values = {}
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in values.items()]
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram("ticket_stage_seconds", "Time spent in each stage of ticket processing", ["stage"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"]
+)
+TICKETS_CLASSIFIED = Counter(
+    "tickets_classified_total", "Classified tickets by predicted queue and the stage that answered", ["queue", "stage"]
+)
+CLASSIFIER_BATCH_SIZE = Histogram(
+    "classifier_batch_size", "Tickets per micro-batch forward pass", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+REPLIES = Counter("replies_total", "Finished reply generations by outcome", ["status"])
+DUPLICATE_TICKETS = Counter("duplicate_tickets_total", "Tickets matched to a recent near-duplicate at ingest")
+ERRORS = Counter("errors_total", "Errors by pipeline stage", ["stage"])
+LLM_CALL_SECONDS = Histogram("llm_call_seconds", "LLM provider call latency by outcome", ["kind", "outcome"])
+LLM_REQUESTS = Counter(
+    "llm_requests_total", "LLM requests by result (ok, failed, coalesced, circuit_open)", ["kind", "result"]
+)
+LLM_RETRIES = Counter("llm_retries_total", "Retried LLM provider calls", ["kind"])
+
+
+# Spans of the current HTTP request, surfaced in its Server-Timing header (None outside requests)
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    """Time a block into ticket_stage_seconds{stage} (and the request's Server-Timing)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def detach_request():
+    """Long-lived tasks spawned from a request must not keep appending to its spans"""
+    _request_spans.set(None)
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware (safe for streaming responses): records request latency per route
+    template and adds a Server-Timing header with the spans recorded while handling it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        spans = []
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                timings = spans + [("total", time.perf_counter() - start)]
+                header = ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings)
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"server-timing", header.encode())])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_spans.reset(token)
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=scope["method"], route=route_label(scope), status=status[0]
+            )
+
+
+def route_label(scope):
+    """Route template like /api/tickets/{role}/{user_id} - keeps label cardinality bounded.
+    Depending on the FastAPI version the matched route's path may lack the router prefix,
+    so the prefix is taken from the request path."""
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "unmatched"
+    extra = scope["path"].count("/") - template.count("/")
+    prefix = "/".join(scope["path"].split("/")[:extra + 1]) if extra > 0 else ""
+    return prefix + template
@@ -0,0 +1,62 @@
+import os
+from datetime import datetime
+
+# backend/training/models
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'training', 'models')
+# Each retrain writes a new version directory under registry/; CURRENT names the one to serve
+REGISTRY_DIR = os.path.join(MODELS_DIR, 'registry')
+CURRENT_FILE = os.path.join(REGISTRY_DIR, 'CURRENT')
+# Single in-place model directory used before the registry existed
+LEGACY_VERSION = 'fine_tuned_bert'
+LEGACY_PATH = os.path.join(MODELS_DIR, LEGACY_VERSION)
+
+
+def list_versions():
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(REGISTRY_DIR)
+        if os.path.isfile(os.path.join(REGISTRY_DIR, name, 'config.json'))
+    )
+
+
+def current_version():
+    """The version named in CURRENT, else the newest registry version, else the legacy directory"""
+    if os.path.exists(CURRENT_FILE):
+        with open(CURRENT_FILE) as f:
+            version = f.read().strip()
+        if version:
+            return version
+    versions = list_versions()
+    return versions[-1] if versions else LEGACY_VERSION
+
+
+def version_path(version):
+    if version == LEGACY_VERSION:
+        return LEGACY_PATH
+    path = os.path.join(REGISTRY_DIR, version)
+    if os.path.basename(path) != version or not os.path.isdir(path):
+        raise ValueError(f"Unknown model version '{version}'")
+    return path
+
+
+def new_version():
+    """Create and return (version, path) for a fresh registry entry"""
+    version = datetime.utcnow().strftime("v%Y%m%d-%H%M%S")
+    path = os.path.join(REGISTRY_DIR, version)
+    os.makedirs(path, exist_ok=False)
+    return version, path
+
+
+def set_current(version):
+    """Atomically point CURRENT at `version` - watchers in every worker pick it up"""
+    version_path(version)
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    tmp_path = CURRENT_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, CURRENT_FILE)
+
+
+def current_mtime():
+    return os.path.getmtime(CURRENT_FILE) if os.path.exists(CURRENT_FILE) else None
@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+from collections import Counter
+
+# Opt-in: GET /api/admin/profile is only served when PROFILER_ENABLED=true
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+
+# Leaf frames of threads parked waiting for work (executor queues, the event loop's select,
+# condition variables) - skipped by default so the output shows where CPU time goes
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("_base.py", "result"),
+}
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the Python stack of every thread at a fixed interval and counts identical stacks.
+
+    Output is in the collapsed-stack format ("outer;...;inner count" per line) that
+    flamegraph.pl and speedscope read. Samples only between start() and stop(), so there is
+    no overhead otherwise.
+    """
+
+    def __init__(self, interval_ms=5, include_idle=False):
+        self.interval = interval_ms / 1000.0
+        self.include_idle = include_idle
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample_once(self, own_thread):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+            if not self.include_idle and leaf in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample_once(own_thread)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self, limit=None):
+        return "\n".join(f"{stack} {count}" for stack, count in self.counts.most_common(limit)) + "\n"
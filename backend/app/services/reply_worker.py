@@ -0,0 +1,212 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
+from ..db import SessionLocal
+from ..models import Ticket, ReplyStatus
+from .metrics import ERRORS, REPLIES, detach_request, span
+
+
+class ReplyPipeline:
+    """Background worker pool that fills in Ticket.generated_reply after /predict has returned.
+
+    Failed LLM calls are retried with exponential backoff and jitter; tickets that
+    still fail after REPLY_MAX_RETRIES are marked FAILED. Clients can wait for a
+    ticket's reply through `wait_for()`.
+
+    Near-duplicate tickets (with a parent_ticket_id) reuse their parent's reply instead of calling
+    the LLM; if the parent's reply is still queued here, they wait for it without holding a worker.
+
+    Every worker process re-queues pending tickets at startup, so a ticket is claimed in the
+    database (Ticket.reply_claimed_at) before its reply is generated; only one process wins the
+    claim, and it lapses after REPLY_LEASE_SECONDS if that process dies.
+    """
+
+    def __init__(self, gemini_service, workers=None, max_retries=None, backoff_base=None):
+        self.gemini_service = gemini_service
+        self.workers = workers or int(os.getenv("REPLY_WORKERS", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("REPLY_MAX_RETRIES", "3"))
+        self.backoff_base = backoff_base if backoff_base is not None else float(os.getenv("REPLY_BACKOFF_SECONDS", "1"))
+        self.lease_seconds = float(os.getenv("REPLY_LEASE_SECONDS", "600"))
+        self._queue = None
+        self._tasks = []
+        self._waiters = {}
+        # Tickets queued or in progress, and the near-duplicates parked until their parent is done
+        self._active = set()
+        self._followers = {}
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.get_running_loop().create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def enqueue(self, ticket_id):
+        self._active.add(ticket_id)
+        await self._queue.put(ticket_id)
+
+    async def recover(self):
+        """Re-queue tickets left pending by a previous run (e.g. the process restarted mid-generation)"""
+        ticket_ids = await run_in_threadpool(_pending_ticket_ids, self.lease_seconds)
+        for ticket_id in ticket_ids:
+            await self.enqueue(ticket_id)
+        return len(ticket_ids)
+
+    async def wait_for(self, ticket_id, timeout):
+        """Block until the ticket's reply is finished or `timeout` seconds pass"""
+        event = asyncio.Event()
+        self._waiters.setdefault(ticket_id, set()).add(event)
+        try:
+            # The reply may have been stored between the caller's read and registering above
+            ticket = await run_in_threadpool(_load_ticket, ticket_id)
+            if ticket is None or ticket.reply_status != ReplyStatus.PENDING:
+                return
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            events = self._waiters.get(ticket_id)
+            if events is not None:
+                events.discard(event)
+                if not events:
+                    del self._waiters[ticket_id]
+
+    async def _worker(self):
+        detach_request()
+        while True:
+            ticket_id = await self._queue.get()
+            parked = False
+            try:
+                parked = await self._process(ticket_id)
+            except Exception as e:
+                print(f"⚠️ Reply generation crashed for ticket {ticket_id}: {e}")
+            finally:
+                self._queue.task_done()
+                if not parked:
+                    self._active.discard(ticket_id)
+                    for follower in self._followers.pop(ticket_id, []):
+                        self._queue.put_nowait(follower)
+                    for event in self._waiters.pop(ticket_id, ()):
+                        event.set()
+
+    async def _process(self, ticket_id):
+        """Generate and store the reply; returns True if the ticket was parked behind its parent"""
+        ticket = await run_in_threadpool(_load_ticket, ticket_id)
+        if ticket is None or ticket.reply_status != ReplyStatus.PENDING:
+            return False
+
+        if ticket.parent_ticket_id is not None:
+            if ticket.parent_ticket_id in self._active:
+                self._followers.setdefault(ticket.parent_ticket_id, []).append(ticket_id)
+                return True
+
+        # Another worker process is already generating this reply
+        if not await run_in_threadpool(_claim_ticket, ticket_id, self.lease_seconds):
+            return False
+
+        if ticket.parent_ticket_id is not None and await self._reuse_parent_reply(ticket):
+            return False
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with span("reply_generation"):
+                    reply = await self.gemini_service.agenerate_reply(
+                        ticket.body,
+                        ticket.predicted_queue,
+                        ticket.ticket_number,
+                        ticket.client_name
+                    )
+                with span("reply_store"):
+                    await run_in_threadpool(_store_reply, ticket_id, reply, ReplyStatus.READY, attempt)
+                REPLIES.inc(status=ReplyStatus.READY.value)
+                return False
+            except Exception as e:
+                ERRORS.inc(stage="reply_generation")
+                print(f"⚠️ Reply attempt {attempt}/{self.max_retries} failed for {ticket.ticket_number}: {e}")
+                if attempt < self.max_retries:
+                    delay = self.backoff_base * (2 ** (attempt - 1))
+                    await asyncio.sleep(delay + random.uniform(0, delay))
+
+        await run_in_threadpool(_store_reply, ticket_id, None, ReplyStatus.FAILED, self.max_retries)
+        REPLIES.inc(status=ReplyStatus.FAILED.value)
+        return False
+
+    async def _reuse_parent_reply(self, ticket):
+        parent = await run_in_threadpool(_load_ticket, ticket.parent_ticket_id)
+        if parent is None or parent.reply_status != ReplyStatus.READY:
+            return False
+        reply = self.gemini_service.reuse_reply(
+            parent.generated_reply,
+            ticket.body,
+            ticket.predicted_queue,
+            ticket.ticket_number,
+            ticket.client_name
+        )
+        if reply is None:
+            return False
+        with span("reply_store"):
+            await run_in_threadpool(_store_reply, ticket.id, reply, ReplyStatus.READY, 0)
+        REPLIES.inc(status="reused")
+        return True
+
+
+def _unclaimed(lease_seconds):
+    """Filter for tickets no worker holds a live claim on"""
+    expired = datetime.utcnow() - timedelta(seconds=lease_seconds)
+    return or_(Ticket.reply_claimed_at.is_(None), Ticket.reply_claimed_at < expired)
+
+
+def _pending_ticket_ids(lease_seconds):
+    db = SessionLocal()
+    try:
+        rows = db.query(Ticket.id).filter(Ticket.reply_status == ReplyStatus.PENDING, _unclaimed(lease_seconds)) \
+            .order_by(Ticket.id).all()
+        return [row.id for row in rows]
+    finally:
+        db.close()
+
+
+def _claim_ticket(ticket_id, lease_seconds):
+    """Atomically take the ticket for this worker; False if it is done or another worker holds it"""
+    db = SessionLocal()
+    try:
+        claimed = db.query(Ticket).filter(
+            Ticket.id == ticket_id, Ticket.reply_status == ReplyStatus.PENDING, _unclaimed(lease_seconds)
+        ).update({Ticket.reply_claimed_at: datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+    finally:
+        db.close()
+
+
+def _load_ticket(ticket_id):
+    db = SessionLocal()
+    try:
+        ticket = db.get(Ticket, ticket_id)
+        if ticket is not None:
+            db.expunge(ticket)
+        return ticket
+    finally:
+        db.close()
+
+
+def _store_reply(ticket_id, reply, status, attempts):
+    db = SessionLocal()
+    try:
+        db.query(Ticket).filter(Ticket.id == ticket_id).update({
+            Ticket.generated_reply: reply,
+            Ticket.reply_status: status,
+            Ticket.reply_attempts: attempts,
+        })
+        db.commit()
+    finally:
+        db.close()
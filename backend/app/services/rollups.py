@@ -0,0 +1,137 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import text, tuple_
+from ..models import Ticket, TicketRollup, TicketStatus
+
+# Dashboard counts live in ticket_rollups, one row per (department, queue, status, creation day).
+# Every write that adds a ticket or moves one between keys applies its deltas in the same
+# transaction, so /api/stats reads a table whose size doesn't grow with the number of tickets.
+# training/rebuild_rollups.py recomputes the table from `tickets`; main.py backfills it once when
+# the table is first created on a database that already has tickets.
+
+ROLLUP_COLUMNS = ("assigned_department", "predicted_queue", "status", "day")
+# Ticket columns a rollup key is computed from (plus id for keyset reads)
+ROLLUP_FIELDS = (Ticket.id, Ticket.assigned_department, Ticket.predicted_queue, Ticket.status, Ticket.created_at)
+# Rows per INSERT statement (stays under SQLite's bound-parameter limit)
+UPSERT_BATCH_SIZE = 500
+
+
+def rollup_key(department, queue, status, created_at):
+    return (department or "", queue or "", status or TicketStatus.PENDING, (created_at or datetime.utcnow()).date())
+
+
+def ticket_key(ticket):
+    """Rollup key of a Ticket (or a row with the same attributes)"""
+    return rollup_key(ticket.assigned_department, ticket.predicted_queue, ticket.status, ticket.created_at)
+
+
+def _upsert(db, rows):
+    """INSERT ... ON CONFLICT (key) DO UPDATE count = count + new, where the dialect has it"""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(TicketRollup).values(rows)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=list(ROLLUP_COLUMNS), set_={"count": TicketRollup.count + statement.excluded["count"]}
+        ))
+    elif dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(TicketRollup).values(rows)
+        db.execute(statement.on_duplicate_key_update(count=TicketRollup.count + statement.inserted["count"]))
+    else:
+        for row in rows:
+            updated = db.query(TicketRollup).filter(
+                tuple_(*(getattr(TicketRollup, column) for column in ROLLUP_COLUMNS)) == tuple(row[c] for c in ROLLUP_COLUMNS)
+            ).update({TicketRollup.count: TicketRollup.count + row["count"]}, synchronize_session=False)
+            if not updated:
+                db.add(TicketRollup(**row))
+
+
+def apply_deltas(db, deltas):
+    """Add {rollup key: change} to ticket_rollups inside the caller's transaction (no commit).
+    Rows are written in key order so concurrent writers lock them in the same order."""
+    rows = [
+        dict(zip(ROLLUP_COLUMNS, key), count=change)
+        for key, change in sorted(deltas.items(), key=lambda item: (item[0][:2], item[0][2].value, item[0][3]))
+        if change
+    ]
+    for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+        _upsert(db, rows[i:i + UPSERT_BATCH_SIZE])
+
+
+def record_inserts(db, tickets):
+    apply_deltas(db, Counter(ticket_key(ticket) for ticket in tickets))
+
+
+def record_move(deltas, old_key, new_key):
+    """Count one ticket moving from old_key to new_key into `deltas`"""
+    if old_key != new_key:
+        deltas[old_key] -= 1
+        deltas[new_key] += 1
+
+
+def backfill(db, chunk_size=5000):
+    """Replace ticket_rollups with counts of every ticket inside the caller's transaction (no commit).
+    Returns the number of tickets counted."""
+    # 1. Lock the table so a second process doing the same waits and then recounts, instead of
+    # adding its counts on top (SQLite: the DELETE takes the database write lock)
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"LOCK TABLE {TicketRollup.__tablename__} IN EXCLUSIVE MODE"))
+    db.query(TicketRollup).delete(synchronize_session=False)
+
+    # 2. Count tickets in id-ordered keyset chunks
+    counts = Counter()
+    last_id = 0
+    while True:
+        rows = db.query(*ROLLUP_FIELDS).filter(Ticket.id > last_id).order_by(Ticket.id).limit(chunk_size).all()
+        if not rows:
+            break
+        counts.update(ticket_key(row) for row in rows)
+        last_id = rows[-1].id
+
+    # 3. Write the rows
+    apply_deltas(db, counts)
+    return sum(counts.values())
+
+
+def read_stats(db, department=None, since=None, until=None, detail=False):
+    """Totals per department, queue, status and day from the rollup rows (optionally one
+    department and a day range)"""
+    query = db.query(TicketRollup).filter(TicketRollup.count != 0)
+    if department:
+        query = query.filter(TicketRollup.assigned_department == department)
+    if since:
+        query = query.filter(TicketRollup.day >= since)
+    if until:
+        query = query.filter(TicketRollup.day <= until)
+
+    total = 0
+    by_department, by_queue, by_status, by_day = Counter(), Counter(), Counter(), Counter()
+    rows = []
+    for row in query.all():
+        total += row.count
+        by_department[row.assigned_department] += row.count
+        by_queue[row.predicted_queue] += row.count
+        by_status[row.status.value] += row.count
+        by_day[row.day.isoformat()] += row.count
+        if detail:
+            rows.append({
+                "department": row.assigned_department or None,
+                "queue": row.predicted_queue or None,
+                "status": row.status.value,
+                "day": row.day.isoformat(),
+                "count": row.count,
+            })
+    stats = {
+        "total": total,
+        "by_department": dict(by_department),
+        "by_queue": dict(by_queue),
+        "by_status": dict(by_status),
+        "by_day": dict(sorted(by_day.items())),
+    }
+    if detail:
+        stats["rows"] = rows
+    return stats
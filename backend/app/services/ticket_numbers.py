@@ -0,0 +1,150 @@
+import os
+import time
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+# Slot locks must be released by the OS when a worker dies: flock, or on Windows a byte-range
+# lock (msvcrt.locking). Without either the allocator refuses to issue numbers rather than guess.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# Ticket numbers look like TKT-20260125-0K3M7Q2A. The 8 characters encode 40 bits:
+#   17 bits  second of the (UTC) day
+#    5 bits  node id       - TICKET_NODE_ID, distinct per host/container sharing the database
+#    5 bits  worker slot   - claimed per process with a lock file in TICKET_SLOT_DIR
+#   13 bits  sequence      - 8192 tickets per second per worker
+# so two workers can never produce the same number and no DB round-trip is needed.
+TICKET_NODE_ID = int(os.getenv("TICKET_NODE_ID", "0"))
+TICKET_SLOT_DIR = os.getenv("TICKET_SLOT_DIR", os.path.join(tempfile.gettempdir(), "ticket-number-slots"))
+
+NODE_BITS = 5
+SLOT_BITS = 5
+SEQUENCE_BITS = 13
+MAX_NODES = 1 << NODE_BITS
+MAX_SLOTS = 1 << SLOT_BITS
+MAX_SEQUENCE = 1 << SEQUENCE_BITS
+SUFFIX_LENGTH = 8
+# Crockford base32: digits and upper-case letters without I, L, O, U
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def encode(value, length=SUFFIX_LENGTH):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def decode_ticket_number(ticket_number):
+    """(issued at, node, slot, sequence) of a number from this allocator - for debugging"""
+    _, date_str, suffix = ticket_number.split("-")
+    value = 0
+    for char in suffix:
+        value = value * 32 + ALPHABET.index(char)
+    sequence = value % MAX_SEQUENCE
+    value //= MAX_SEQUENCE
+    slot = value % MAX_SLOTS
+    value //= MAX_SLOTS
+    node = value % MAX_NODES
+    second = value // MAX_NODES
+    day = datetime.strptime(date_str, "%Y%m%d").replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(day.timestamp() + second, timezone.utc), node, slot, sequence
+
+
+def _try_lock(f):
+    """Exclusive lock on a slot file without waiting; False if another process holds it"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            # Lock the file's first byte (the region may lie past the end of the file)
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class TicketNumberAllocator:
+    """Time + worker sequenced ticket numbers, unique across processes and nodes.
+
+    The worker slot is an exclusive lock (flock, or msvcrt.locking on Windows) on one of MAX_SLOTS
+    files, taken on first use - after a gunicorn fork, not in the master - and released by the OS
+    when the process exits. The slot
+    file also records the last second the slot issued numbers in, so a worker restarted within the
+    same second continues after it instead of reusing its sequence. If the clock steps back, or a
+    second's sequence runs out, the allocator keeps counting from the last second it used.
+    """
+
+    def __init__(self, node_id=TICKET_NODE_ID, slot_dir=TICKET_SLOT_DIR):
+        if not 0 <= node_id < MAX_NODES:
+            raise ValueError(f"TICKET_NODE_ID must be between 0 and {MAX_NODES - 1}, got {node_id}")
+        self.node_id = node_id
+        self.slot_dir = slot_dir
+        self._lock = threading.Lock()
+        self._pid = None
+        self._slot = None
+        self._slot_file = None
+        self._second = 0
+        self._sequence = 0
+
+    def _claim_slot(self):
+        if self._slot_file is not None:
+            # Inherited across fork: the parent still holds this lock
+            self._slot_file.close()
+        self._slot_file = None
+        if fcntl is None and msvcrt is None:
+            raise RuntimeError("Ticket number slots need flock (fcntl) or msvcrt file locks, neither is available")
+        os.makedirs(self.slot_dir, exist_ok=True)
+        for slot in range(MAX_SLOTS):
+            f = open(os.path.join(self.slot_dir, f"node{self.node_id}-slot{slot}"), "a+")
+            if not _try_lock(f):
+                f.close()
+                continue
+            f.seek(0)
+            last = f.read().strip()
+            self._slot, self._slot_file = slot, f
+            self._second = int(last) if last.isdigit() else 0
+            break
+        else:
+            raise RuntimeError(f"All {MAX_SLOTS} ticket number slots of node {self.node_id} are taken "
+                               f"- run fewer workers per node or give them another TICKET_NODE_ID")
+        # Never reuse the second a previous holder of the slot may have issued numbers in
+        self._sequence = MAX_SEQUENCE
+        self._pid = os.getpid()
+
+    def _record_second(self):
+        if self._slot_file is not None:
+            self._slot_file.seek(0)
+            self._slot_file.truncate()
+            self._slot_file.write(str(self._second))
+            self._slot_file.flush()
+
+    def next(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._claim_slot()
+            now = int(time.time())
+            if now > self._second:
+                self._second, self._sequence = now, 0
+                self._record_second()
+            elif self._sequence >= MAX_SEQUENCE:
+                # This second is used up: borrow the next one rather than block the event loop,
+                # the clock catches up
+                self._second, self._sequence = self._second + 1, 0
+                self._record_second()
+            sequence = self._sequence
+            self._sequence += 1
+            second = self._second
+        day = second - second % 86400
+        value = (((second - day) * MAX_NODES + self.node_id) * MAX_SLOTS + self._slot) * MAX_SEQUENCE + sequence
+        date_str = datetime.fromtimestamp(day, timezone.utc).strftime("%Y%m%d")
+        return f"TKT-{date_str}-{encode(value)}"
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+
+# Longest token sequence the model sees at once - shared by training (train.py) and serving
+MAX_LENGTH = int(os.getenv("CLASSIFIER_MAX_LENGTH", "128"))
+# How tickets longer than MAX_LENGTH are handled: "truncate" keeps the start,
+# "window" classifies overlapping chunks and pools their logits
+LONG_TEXT_MODE = os.getenv("CLASSIFIER_LONG_TEXT", "truncate").lower()
+WINDOW_STRIDE = int(os.getenv("CLASSIFIER_WINDOW_STRIDE", "32"))
+MAX_WINDOWS = int(os.getenv("CLASSIFIER_MAX_WINDOWS", "8"))
+WINDOW_POOLING = os.getenv("CLASSIFIER_WINDOW_POOLING", "mean").lower()
+# Padded tokens (rows x longest row) per forward pass; similar lengths are grouped under this budget
+MAX_BATCH_TOKENS = int(os.getenv("CLASSIFIER_MAX_BATCH_TOKENS", "4096"))
+
+
+def encode(tokenizer, texts, max_length=MAX_LENGTH, mode=LONG_TEXT_MODE, stride=WINDOW_STRIDE, max_windows=MAX_WINDOWS):
+    """Tokenize without padding. Returns (chunks, owners): one token id list per chunk and the
+    index of the text each chunk came from. In truncate mode every text is exactly one chunk."""
+    max_length = min(max_length, tokenizer.model_max_length)
+    if mode != "window":
+        encoded = tokenizer(texts, truncation=True, max_length=max_length)
+        return encoded["input_ids"], list(range(len(texts)))
+
+    encoded = tokenizer(
+        texts,
+        truncation=True,
+        max_length=max_length,
+        stride=stride,
+        return_overflowing_tokens=True,
+    )
+    owners = encoded.get("overflow_to_sample_mapping")
+    if owners is None:
+        # Slow tokenizers don't report which text a window belongs to
+        encoded = tokenizer(texts, truncation=True, max_length=max_length)
+        return encoded["input_ids"], list(range(len(texts)))
+
+    chunks, kept_owners, seen = [], [], {}
+    for ids, owner in zip(encoded["input_ids"], owners):
+        seen[owner] = seen.get(owner, 0) + 1
+        if seen[owner] <= max_windows:
+            chunks.append(ids)
+            kept_owners.append(owner)
+    return chunks, kept_owners
+
+
+def length_buckets(lengths, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Group indices of similar length so each batch is padded only to its own longest row.
+    Indices are sorted by length and cut whenever rows x longest row would exceed the budget."""
+    buckets, bucket = [], []
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # Sorted ascending, so the row being added is the longest in the bucket
+        if bucket and (len(bucket) + 1) * lengths[i] > max_batch_tokens:
+            buckets.append(bucket)
+            bucket = []
+        bucket.append(i)
+    if bucket:
+        buckets.append(bucket)
+    return buckets
+
+
+def pad_batch(tokenizer, chunks, return_tensors):
+    return tokenizer.pad(
+        {"input_ids": chunks, "attention_mask": [[1] * len(ids) for ids in chunks]},
+        padding="longest",
+        return_tensors=return_tensors,
+    )
+
+
+def pool_logits(chunk_logits, owners, n_texts, pooling=WINDOW_POOLING):
+    """Combine per-window logits into one row per text (mean or max over its windows)"""
+    owners = np.asarray(owners)
+    if len(owners) == n_texts:
+        pooled = np.empty_like(chunk_logits)
+        pooled[owners] = chunk_logits
+        return pooled
+
+    pooled = np.empty((n_texts, chunk_logits.shape[1]), dtype=chunk_logits.dtype)
+    for i in range(n_texts):
+        windows = chunk_logits[owners == i]
+        pooled[i] = windows.max(axis=0) if pooling == "max" else windows.mean(axis=0)
+    return pooled
+
+
+def config_key(max_length=MAX_LENGTH, mode=LONG_TEXT_MODE, stride=WINDOW_STRIDE, max_windows=MAX_WINDOWS, pooling=WINDOW_POOLING):
+    """Identifies the settings that change model output, for cache keys"""
+    if mode != "window":
+        return f"truncate:{max_length}"
+    return f"window:{max_length}:{stride}:{max_windows}:{pooling}"
@@ -0,0 +1,89 @@
+import os
+import time
+import random
+import argparse
+
+from common import add_output_args, finish, summarize
+
+# Results must come from the model, not from the classification cache
+os.environ["CLASSIFIER_CACHE_SIZE"] = "0"
+os.environ["CLASSIFIER_DISK_CACHE"] = ""
+
+from app.services.classifier import TicketClassifierService
+
+# Ticket-like filler with none of the keyword rule phrases, so these texts go to the model
+FILLER = (
+    "my laptop screen flickers after the latest update and the vpn client disconnects every few minutes "
+    "our team cannot sync the shared calendar since monday and the dashboard shows a timeout when loading reports "
+    "the invoice for last month lists two licences we cancelled and the refund has not arrived yet "
+    "please reset the admin account password because the recovery email goes to a former employee"
+).split()
+KEYWORD_SENTENCE = "we would like to buy twenty more seats, can you send a quote for the enterprise plan"
+
+
+def make_texts(count, words, keyword, rng):
+    """`count` distinct tickets of about `words` words"""
+    texts = []
+    for i in range(count):
+        body = " ".join(rng.choice(FILLER) for _ in range(words))
+        texts.append(f"{KEYWORD_SENTENCE} {body} ref {i}" if keyword else f"{body} ref {i}")
+    return texts
+
+
+def bench(service, name, batch_size, words, keyword, iterations, warmup, rng):
+    for _ in range(warmup):
+        service.predict_batch(make_texts(batch_size, words, keyword, rng))
+
+    batches = [make_texts(batch_size, words, keyword, rng) for _ in range(iterations)]
+    latencies = []
+    start = time.perf_counter()
+    for texts in batches:
+        call_start = time.perf_counter()
+        service.predict_batch(texts)
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    return summarize(
+        f"{name} batch={batch_size} words={words}", latencies, elapsed,
+        items=batch_size * iterations, path=name, batch_size=batch_size, words=words,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for TicketClassifierService.predict")
+    parser.add_argument("--backend", default=None, help="torch|int8|onnx (default CLASSIFIER_BACKEND)")
+    parser.add_argument("--model-path", default=None, help="defaults to the current registry version")
+    parser.add_argument("--paths", nargs="+", default=["keyword", "bert", "cascade"], choices=["keyword", "bert", "cascade"])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 64])
+    parser.add_argument("--words", type=int, nargs="+", default=[16, 64, 256], help="ticket lengths in words")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    add_output_args(parser)
+    args = parser.parse_args()
+
+    service = TicketClassifierService(backend=args.backend, model_path=args.model_path)
+    service.warmup()
+    rng = random.Random(1234)
+    if service.keyword_label(KEYWORD_SENTENCE) is None:
+        print("⚠️ The keyword rules don't match the sample sentence - skipping the keyword path")
+        args.paths = [path for path in args.paths if path != "keyword"]
+    if "cascade" in args.paths and service.model.first_stage is None:
+        print("⚠️ No first-stage model in this version (training/train_linear.py) - skipping the cascade path")
+        args.paths = [path for path in args.paths if path != "cascade"]
+
+    threshold = service.cascade_threshold
+    results = []
+    for path in args.paths:
+        # bert: every ticket goes through the transformer; cascade: the first stage answers confident ones
+        service.cascade_threshold = threshold if path == "cascade" else 2.0
+        for words in args.words:
+            for batch_size in args.batch_sizes:
+                results.append(bench(service, path, batch_size, words, path == "keyword", args.iterations, args.warmup, rng))
+                print(f"   {results[-1]['name']}: p50 {results[-1]['p50_ms']:.2f} ms", flush=True)
+
+    config = {
+        "backend": os.getenv("CLASSIFIER_BACKEND", "torch") if args.backend is None else args.backend,
+        "model_version": service.model_version,
+        "cascade_threshold": threshold,
+        "iterations": args.iterations,
+    }
+    finish(args, "classifier", config, results)
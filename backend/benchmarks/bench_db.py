@@ -0,0 +1,169 @@
+import os
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from common import add_output_args, finish, summarize
+
+parser = argparse.ArgumentParser(description="Benchmark ticket inserts and list queries at growing table sizes")
+parser.add_argument("--database-url", default="sqlite:///./bench_tickets.db",
+                    help="separate database to fill - never point this at real data")
+parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000], help="table sizes to measure at")
+parser.add_argument("--queries", type=int, default=200, help="timed calls per list query")
+parser.add_argument("--inserts", type=int, default=200, help="single-ticket inserts per size")
+parser.add_argument("--bulk-batches", type=int, default=10, help="bulk insert transactions per size")
+parser.add_argument("--deep-pages", type=int, default=20, help="pages to follow for the deep pagination query")
+parser.add_argument("--clients", type=int, default=1000)
+parser.add_argument("--reset", action="store_true", help="drop and recreate the tickets table first")
+add_output_args(parser)
+args = parser.parse_args()
+
+# app.db reads DATABASE_URL at import; the API module needs no real LLM here
+os.environ["DATABASE_URL"] = args.database_url
+os.environ.setdefault("LLM_PROVIDER", "stub")
+
+from sqlalchemy import func
+from app.db import Base, engine, SessionLocal, upgrade_schema
+from app.models import Ticket, TicketStatus, ReplyStatus
+from app.departments import DEPARTMENT_MAPPING
+from app.api import BULK_CHUNK_SIZE, keyset_page, role_tickets_query, save_ticket, insert_tickets
+
+SEED_CHUNK = 10_000
+QUEUES = list(DEPARTMENT_MAPPING)
+rng = random.Random(1234)
+
+
+def ticket_row(n, created_at):
+    queue = rng.choice(QUEUES)
+    client_id = rng.randint(1, args.clients)
+    return {
+        "ticket_number": f"BENCH-{n:010d}",
+        "client_id": client_id,
+        "client_name": f"Client {client_id}",
+        "body": "benchmark ticket body " * rng.randint(2, 40),
+        "predicted_queue": queue,
+        "model_version": "bench",
+        "generated_reply": "Thank you for contacting us, we are looking into it.",
+        "reply_status": ReplyStatus.READY,
+        "reply_attempts": 0,
+        "status": TicketStatus.PENDING,
+        "assigned_department": DEPARTMENT_MAPPING[queue],
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def table_size():
+    with SessionLocal() as db:
+        return db.query(func.count(Ticket.id)).scalar()
+
+
+def next_number():
+    with SessionLocal() as db:
+        return (db.query(func.max(Ticket.id)).scalar() or 0) + 1
+
+
+def seed_to(size):
+    """Grow the table to `size` rows with core bulk inserts (not timed)"""
+    current = table_size()
+    if current >= size:
+        return
+    print(f"Seeding {size - current} tickets ({current} -> {size})...", flush=True)
+    n = next_number()
+    # Spread over the past year, oldest first, like real traffic
+    created_at = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / max(size - current, 1)
+    start = time.perf_counter()
+    remaining = size - current
+    while remaining:
+        rows = []
+        for _ in range(min(SEED_CHUNK, remaining)):
+            rows.append(ticket_row(n, created_at))
+            n += 1
+            created_at += step
+        with engine.begin() as conn:
+            conn.execute(Ticket.__table__.insert(), rows)
+        remaining -= len(rows)
+    print(f"   seeded in {time.perf_counter() - start:.1f}s", flush=True)
+
+
+def timed_calls(name, calls, fn, items_per_call=1, **extra):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(calls):
+        call_start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(name, latencies, time.perf_counter() - start, items=calls * items_per_call, **extra)
+
+
+def bench_size(size):
+    results = []
+    label = f"{size:,}".replace(",", "_")
+    n = next_number() + 1_000_000_000
+
+    # One ticket per transaction, as /api/predict stores them
+    def single(i):
+        with SessionLocal() as db:
+            save_ticket(db, Ticket(**ticket_row(n + i, datetime.utcnow())))
+    results.append(timed_calls(f"insert_single rows={label}", args.inserts, single, table_rows=size))
+
+    # Chunked transactions, as /api/tickets/bulk stores them
+    offset = n + args.inserts
+    def bulk(i):
+        insert_tickets([ticket_row(offset + i * BULK_CHUNK_SIZE + j, datetime.utcnow()) for j in range(BULK_CHUNK_SIZE)])
+    results.append(timed_calls(
+        f"insert_bulk chunk={BULK_CHUNK_SIZE} rows={label}", args.bulk_batches, bulk,
+        items_per_call=BULK_CHUNK_SIZE, table_rows=size,
+    ))
+
+    # First page of each listing, the same queries GET /api/tickets/{role}/{user_id} runs
+    views = [("admin", 1), ("client", None), ("technical_support", 0), ("accounting", 0), ("sales", 0)]
+    for role, user_id in views:
+        def first_page(i, role=role, user_id=user_id):
+            with SessionLocal() as db:
+                keyset_page(role_tickets_query(db, role, user_id or rng.randint(1, args.clients)), 50)
+        results.append(timed_calls(f"list_{role} first_page rows={label}", args.queries, first_page, table_rows=size))
+
+    # Following the cursor: cost should not grow with depth
+    def deep(i):
+        with SessionLocal() as db:
+            cursor = None
+            for _ in range(args.deep_pages):
+                _, cursor = keyset_page(role_tickets_query(db, "sales", 0), 50, cursor)
+                if not cursor:
+                    break
+    results.append(timed_calls(
+        f"list_sales {args.deep_pages}_pages rows={label}", max(args.queries // args.deep_pages, 5), deep,
+        items_per_call=args.deep_pages, table_rows=size,
+    ))
+
+    max_id = next_number() - 1
+    def detail(i):
+        with SessionLocal() as db:
+            db.get(Ticket, rng.randint(1, max_id))
+    results.append(timed_calls(f"ticket_detail rows={label}", args.queries, detail, table_rows=size))
+    return results
+
+
+if __name__ == "__main__":
+    if args.reset:
+        Ticket.__table__.drop(engine, checkfirst=True)
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+
+    results = []
+    for size in sorted(args.sizes):
+        seed_to(size)
+        print(f"Measuring at {table_size():,} tickets...", flush=True)
+        results.extend(bench_size(size))
+
+    config = {
+        "database": engine.url.render_as_string(hide_password=True),
+        "sizes": sorted(args.sizes),
+        "queries": args.queries,
+        "inserts": args.inserts,
+        "bulk_chunk_size": BULK_CHUNK_SIZE,
+    }
+    finish(args, "db", config, results)
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+from common import add_output_args, finish, summarize
+from fake_llm_server import FakeLLM, serve
+
+parser = argparse.ArgumentParser(description="Drive GeminiService's managed LLM client against a fake provider")
+parser.add_argument("--url", default=None, help="fake server to use (default: start one in-process)")
+parser.add_argument("--port", type=int, default=8765, help="port for the in-process fake server")
+parser.add_argument("--requests", type=int, default=200, help="replies per scenario, all started at once")
+parser.add_argument("--delay-ms", type=float, default=100, help="provider latency when healthy")
+parser.add_argument("--max-concurrency", type=int, default=16)
+parser.add_argument("--timeout", type=float, default=1.0, help="LLM_TIMEOUT_SECONDS")
+parser.add_argument("--deadline", type=float, default=5.0, help="LLM_DEADLINE_SECONDS")
+parser.add_argument("--breaker-failures", type=int, default=5)
+parser.add_argument("--breaker-reset", type=float, default=2.0, help="LLM_BREAKER_RESET_SECONDS")
+add_output_args(parser)
+args = parser.parse_args()
+
+url = args.url or f"http://127.0.0.1:{args.port}"
+# Read by app.services.llm_client / gemini at import
+os.environ.update({
+    "LLM_PROVIDER": "gemini",
+    "REPLY_MODE": "summary",
+    "GEMINI_API_KEY": "fake-key",
+    "LLM_BASE_URL": url,
+    "LLM_MAX_CONCURRENCY": str(args.max_concurrency),
+    "LLM_TIMEOUT_SECONDS": str(args.timeout),
+    "LLM_DEADLINE_SECONDS": str(args.deadline),
+    "LLM_BREAKER_FAILURES": str(args.breaker_failures),
+    "LLM_BREAKER_RESET_SECONDS": str(args.breaker_reset),
+})
+
+from app.services.gemini import GeminiService
+
+# (name, provider behaviour, identical tickets?)
+SCENARIOS = [
+    ("healthy", {"delay_ms": args.delay_ms, "failure_rate": 0, "stall_rate": 0}, False),
+    ("coalesced", {"delay_ms": args.delay_ms, "failure_rate": 0, "stall_rate": 0}, True),
+    ("outage", {"delay_ms": 10, "failure_rate": 1, "stall_rate": 0}, False),
+    ("recovered", {"delay_ms": args.delay_ms, "failure_rate": 0, "stall_rate": 0}, False),
+    ("stalled", {"delay_ms": args.delay_ms, "failure_rate": 0, "stall_rate": 1, "stall_ms": 30000}, False),
+]
+
+
+def admin(method, path, payload=None):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+    conn.request(method, path, body=json.dumps(payload or {}), headers={"Content-Type": "application/json"})
+    return json.loads(conn.getresponse().read())
+
+
+async def one(service, text, i):
+    start = time.perf_counter()
+    try:
+        reply = await service.agenerate_reply(text, "Technical Support", f"TKT-BENCH-{i:06d}", "Bench Client")
+        fallback = 'your message: "' in reply
+        return time.perf_counter() - start, fallback, None
+    except Exception as e:
+        return time.perf_counter() - start, False, type(e).__name__
+
+
+async def run_scenario(service, name, identical):
+    texts = [
+        f"{name} run: my laptop cannot reach the vpn gateway" + ("" if identical else f" from site {i}")
+        for i in range(args.requests)
+    ]
+    began = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(service, text, i) for i, text in enumerate(texts)))
+    return outcomes, time.perf_counter() - began
+
+
+async def main():
+    service = GeminiService()
+    results = []
+    for name, behaviour, identical in SCENARIOS:
+        admin("POST", "/_config", behaviour)
+        if name == "recovered":
+            # After the breaker's reset period one probe call closes the circuit again
+            await asyncio.sleep(args.breaker_reset)
+            await one(service, "probe: my laptop cannot reach the vpn gateway", 0)
+        admin("POST", "/_reset")
+        print(f"Running {name} ({args.requests} replies)...", flush=True)
+        outcomes, elapsed = await run_scenario(service, name, identical)
+        stats = admin("GET", "/_stats")
+        errors = [error for _, _, error in outcomes if error]
+        results.append(summarize(
+            name, [latency for latency, _, _ in outcomes], elapsed, errors=len(errors),
+            provider_calls=stats["requests"],
+            provider_max_in_flight=stats["max_in_flight"],
+            fallbacks=sum(fallback for _, fallback, _ in outcomes),
+            error_types=sorted(set(errors)),
+            circuit=service.llm_pool.breaker.state,
+        ))
+        row = results[-1]
+        print(f"   provider calls {row['provider_calls']} (max {row['provider_max_in_flight']} in flight), "
+              f"fallbacks {row['fallbacks']}, errors {row['errors']} {row['error_types']}, circuit {row['circuit']}",
+              flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    server = None
+    if not args.url:
+        fake = FakeLLM(delay_ms=args.delay_ms)
+        server = serve(args.port, fake)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        results = asyncio.run(main())
+    finally:
+        if server:
+            server.shutdown()
+    finish(args, "llm_client", {key: value for key, value in vars(args).items()
+                                if key not in ("output", "compare", "tolerance")}, results)
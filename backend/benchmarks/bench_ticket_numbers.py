@@ -0,0 +1,134 @@
+import re
+import sys
+import time
+import random
+import string
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from collections import Counter
+
+from common import add_output_args, finish, summarize
+from app.services.ticket_numbers import TicketNumberAllocator, decode_ticket_number
+
+TICKET_NUMBER = re.compile(r"^TKT-\d{8}-[0-9A-HJKMNP-TV-Z]{8}$")
+
+
+def generate(node_id, slot_dir, threads, count):
+    """One worker process: `threads` threads sharing one allocator, `count` numbers each.
+    Returns the numbers and the seconds each call took."""
+    allocator = TicketNumberAllocator(node_id=node_id, slot_dir=slot_dir)
+    numbers, latencies = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def run():
+        local_numbers, local_latencies = [], []
+        start.wait()
+        for _ in range(count):
+            began = time.perf_counter()
+            local_numbers.append(allocator.next())
+            local_latencies.append(time.perf_counter() - began)
+        with lock:
+            numbers.extend(local_numbers)
+            latencies.extend(local_latencies)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return numbers, latencies
+
+
+def restarted_worker(slot_dir, count, queue):
+    queue.put(generate(0, slot_dir, 1, count)[0])
+
+
+def legacy_number():
+    """The previous generator: 4 random characters per day"""
+    return "TKT-20260125-" + "".join(random.choices(string.ascii_uppercase + string.digits, k=4))
+
+
+def check(name, numbers):
+    """Duplicates and malformed numbers (printed), returned as an error count"""
+    duplicates = sum(count - 1 for count in Counter(numbers).values() if count > 1)
+    malformed = [number for number in numbers if not TICKET_NUMBER.match(number)]
+    if duplicates or malformed:
+        print(f"❌ {name}: {duplicates} duplicate(s), {len(malformed)} malformed (e.g. {malformed[:3]})", flush=True)
+    else:
+        print(f"✅ {name}: {len(numbers)} numbers, all unique", flush=True)
+    return duplicates + len(malformed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the ticket number allocator across processes, threads and nodes")
+    parser.add_argument("--nodes", type=int, default=2, help="simulated nodes, each with its own TICKET_NODE_ID and slot directory")
+    parser.add_argument("--processes", type=int, default=4, help="worker processes per node")
+    parser.add_argument("--threads", type=int, default=4, help="threads per process")
+    parser.add_argument("--count", type=int, default=20000, help="numbers per thread")
+    parser.add_argument("--restarts", type=int, default=20, help="short-lived processes started one after another on one slot")
+    parser.add_argument("--restart-count", type=int, default=2000, help="numbers per restarted process")
+    add_output_args(parser)
+    args = parser.parse_args()
+
+    results = []
+    errors = 0
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as base:
+        # 1. Every process of every node at once, all threads hammering their process's allocator
+        jobs = [
+            (node, f"{base}/node{node}", args.threads, args.count)
+            for node in range(args.nodes) for _ in range(args.processes)
+        ]
+        with context.Pool(len(jobs)) as pool:
+            began = time.perf_counter()
+            outputs = pool.starmap(generate, jobs)
+            elapsed = time.perf_counter() - began
+        numbers = [number for batch, _ in outputs for number in batch]
+        workers = {decode_ticket_number(batch[0])[1:3] for batch, _ in outputs}
+        duplicates = check("concurrent workers", numbers)
+        if len(workers) != len(jobs):
+            print(f"❌ {len(jobs)} processes shared {len(workers)} (node, slot) pairs", flush=True)
+            duplicates += 1
+        errors += duplicates
+        results.append(summarize(
+            "allocator_concurrent", [latency for _, batch in outputs for latency in batch], elapsed,
+            errors=duplicates, nodes=args.nodes, processes=len(jobs), threads=args.threads,
+        ))
+
+        # 2. Workers restarted back to back take over the same slot within the same second
+        queue = context.Queue()
+        restarted = []
+        began = time.perf_counter()
+        for _ in range(args.restarts):
+            process = context.Process(target=restarted_worker, args=(f"{base}/restarts", args.restart_count, queue))
+            process.start()
+            restarted.extend(queue.get())
+            process.join()
+        elapsed = time.perf_counter() - began
+        duplicates = check("restarted workers", restarted)
+        errors += duplicates
+        results.append(summarize("allocator_restarts", [elapsed / args.restarts] * args.restarts, elapsed,
+                                 items=len(restarted), errors=duplicates))
+
+    # 3. The previous random generator at the same daily volume, for comparison
+    latencies, legacy = [], []
+    began = time.perf_counter()
+    for _ in range(len(numbers)):
+        start = time.perf_counter()
+        legacy.append(legacy_number())
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - began
+    collisions = len(legacy) - len(set(legacy))
+    print(f"   previous 4-character random numbers: {collisions} collision(s) in {len(legacy)}", flush=True)
+    results.append(summarize("legacy_random_4char", latencies, elapsed, errors=collisions))
+
+    finish(args, "ticket_numbers", vars(args), results)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import subprocess
+from datetime import datetime
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+# Benchmarks import the serving code (backend/app) when run as `python benchmarks/<script>.py`
+sys.path.insert(0, BACKEND_DIR)
+
+
+def summarize(name, latencies, elapsed, items=None, errors=0, **extra):
+    """One result row: latency percentiles in ms and throughput.
+    `latencies` are seconds per call, `items` the units processed (defaults to one per call)."""
+    values = np.asarray(latencies, dtype=float) * 1000
+    count = len(values)
+    row = {
+        "name": name,
+        "count": count,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(values, 50)), 3) if count else None,
+        "p95_ms": round(float(np.percentile(values, 95)), 3) if count else None,
+        "p99_ms": round(float(np.percentile(values, 99)), 3) if count else None,
+        "mean_ms": round(float(values.mean()), 3) if count else None,
+        "max_ms": round(float(values.max()), 3) if count else None,
+        "per_second": round((items if items is not None else count) / elapsed, 2) if elapsed else None,
+    }
+    row.update(extra)
+    return row
+
+
+def print_results(results):
+    print(f"{'name':<44} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'per sec':>10} {'errors':>7}")
+    for row in results:
+        print(f"{row['name']:<44} {row['count']:>7} {_fmt(row['p50_ms'])} {_fmt(row['p95_ms'])} "
+              f"{_fmt(row['p99_ms'])} {_fmt(row['per_second'], 10)} {row['errors']:>7}", flush=True)
+
+
+def _fmt(value, width=9):
+    return f"{value:>{width}.2f}" if value is not None else f"{'-':>{width}}"
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(benchmark, config, results, output=None):
+    """Write results to JSON (default benchmarks/results/<benchmark>-<timestamp>.json)"""
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{benchmark}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    payload = {
+        "benchmark": benchmark,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "config": config,
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"📄 Results written to {output}", flush=True)
+    return output
+
+
+def compare(results, baseline_path, tolerance):
+    """Rows whose p95 grew, or throughput dropped, by more than `tolerance` versus the baseline run"""
+    with open(baseline_path) as f:
+        baseline = {row["name"]: row for row in json.load(f)["results"]}
+
+    regressions = []
+    for row in results:
+        before = baseline.get(row["name"])
+        if not before:
+            continue
+        if before["p95_ms"] and row["p95_ms"] and row["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{row['name']}: p95 {before['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms")
+        if before["per_second"] and row["per_second"] and row["per_second"] < before["per_second"] * (1 - tolerance):
+            regressions.append(f"{row['name']}: {before['per_second']:.1f} -> {row['per_second']:.1f} per second")
+    return regressions
+
+
+def add_output_args(parser):
+    parser.add_argument("--output", default=None, help="results JSON path (default benchmarks/results/<name>-<time>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", default=None, help="previous results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown before --compare fails")
+
+
+def finish(args, benchmark, config, results):
+    """Print, save and optionally compare against a baseline - exits 1 on regression"""
+    print_results(results)
+    save_results(benchmark, config, results, args.output)
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) versus {args.compare}:", flush=True)
+            for line in regressions:
+                print(f"   {line}", flush=True)
+            sys.exit(1)
+        print(f"✅ No regressions versus {args.compare} (tolerance {args.tolerance:.0%})", flush=True)
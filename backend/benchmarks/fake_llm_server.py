@@ -0,0 +1,122 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in for the Gemini REST API (POST /v1beta/models/<model>:generateContent) with controllable
+# latency and failures. Point the app at it with LLM_BASE_URL=http://127.0.0.1:<port> and any
+# GEMINI_API_KEY. POST /_config changes the behaviour at runtime, GET /_stats counts requests and
+# POST /_reset zeroes the counters.
+
+MESSAGE = re.compile(r"Customer Message: (.*)")
+
+
+class FakeLLM:
+    def __init__(self, delay_ms=100, jitter_ms=0, failure_rate=0.0, stall_rate=0.0, stall_ms=60000):
+        self.config = {
+            "delay_ms": delay_ms, "jitter_ms": jitter_ms, "failure_rate": failure_rate,
+            "stall_rate": stall_rate, "stall_ms": stall_ms,
+        }
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {"requests": 0, "failures": 0, "stalls": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+            if key == "in_flight":
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def reply(self, prompt):
+        """Status code and body for one generateContent call"""
+        config = dict(self.config)
+        self.count("requests")
+        self.count("in_flight")
+        try:
+            if random.random() < config["stall_rate"]:
+                self.count("stalls")
+                time.sleep(config["stall_ms"] / 1000)
+            else:
+                time.sleep((config["delay_ms"] + random.uniform(0, config["jitter_ms"])) / 1000)
+            if random.random() < config["failure_rate"]:
+                self.count("failures")
+                return 503, {"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}}
+        finally:
+            self.count("in_flight", -1)
+        match = MESSAGE.search(prompt)
+        words = (match.group(1) if match else prompt).split()[:8]
+        text = "the issue with " + " ".join(words).rstrip(".!?,")
+        return 200, {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "modelVersion": "fake",
+        }
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/_stats":
+                return self.send_json(200, {**fake.stats, "config": fake.config})
+            self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+        def do_POST(self):
+            path = self.path.split("?")[0]
+            payload = self.read_json()
+            if path == "/_config":
+                fake.config.update({key: value for key, value in payload.items() if key in fake.config})
+                return self.send_json(200, fake.config)
+            if path == "/_reset":
+                fake.reset()
+                return self.send_json(200, fake.stats)
+            if path.endswith(":generateContent"):
+                prompt = " ".join(
+                    part.get("text", "") for content in payload.get("contents", []) for part in content.get("parts", [])
+                )
+                return self.send_json(*fake.reply(prompt))
+            self.send_json(404, {"error": {"code": 404, "message": f"Unknown path {path}"}})
+
+    return Handler
+
+
+def serve(port, fake):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini generateContent server for LLM client tests")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay-ms", type=float, default=100, help="latency of every call")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra random latency up to this much")
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of calls answered with 503")
+    parser.add_argument("--stall-rate", type=float, default=0, help="fraction of calls that hang for --stall-ms")
+    parser.add_argument("--stall-ms", type=float, default=60000)
+    args = parser.parse_args()
+
+    fake = FakeLLM(args.delay_ms, args.jitter_ms, args.failure_rate, args.stall_rate, args.stall_ms)
+    print(f"🤖 Fake LLM listening on http://127.0.0.1:{args.port}", flush=True)
+    serve(args.port, fake).serve_forever()
@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+
+from common import BACKEND_DIR, add_output_args, finish, summarize
+
+TICKETS = [
+    "My laptop will not connect to the office vpn since this morning and I cannot reach the file server",
+    "I was charged twice for the March invoice, please refund the duplicate payment",
+    "We would like to buy twenty more seats, can you send a quote for the enterprise plan",
+    "The mobile app crashes as soon as I open the reports tab after the latest update",
+    "Please return the damaged headset from order 4821 and send a replacement",
+    "How do I export last quarter's data to csv from the analytics dashboard",
+]
+LIST_VIEWS = [("admin", 1), ("client", 2), ("technical_support", 3), ("accounting", 4), ("sales", 5)]
+
+
+class Worker(threading.Thread):
+    """One keep-alive connection issuing requests back to back until the deadline"""
+
+    def __init__(self, url, scenario, deadline, max_requests, rng, results, lock):
+        super().__init__(daemon=True)
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.scenario = scenario
+        self.deadline = deadline
+        self.max_requests = max_requests
+        self.rng = rng
+        self.results = results
+        self.lock = lock
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            return None
+
+    def next_request(self):
+        kind = self.rng.choices(list(self.scenario), weights=list(self.scenario.values()))[0]
+        if kind == "predict":
+            client_id = self.rng.randint(1, 1000)
+            return kind, "POST", "/api/predict", {
+                "description": f"{self.rng.choice(TICKETS)} (ref {self.rng.randint(1, 10**9)})",
+                "client_id": client_id,
+                "client_name": f"Load Client {client_id}",
+            }
+        role, user_id = self.rng.choice(LIST_VIEWS)
+        return kind, "GET", f"/api/tickets/{role}/{user_id}?limit=50", None
+
+    def run(self):
+        sent = 0
+        while time.perf_counter() < self.deadline and (not self.max_requests or sent < self.max_requests):
+            kind, method, path, body = self.next_request()
+            start = time.perf_counter()
+            status = self.request(method, path, body)
+            latency = time.perf_counter() - start
+            with self.lock:
+                self.results.append((kind, latency, status))
+            sent += 1
+        if self.conn:
+            self.conn.close()
+
+
+def run_load(url, scenario, concurrency, duration, requests_per_worker, seed):
+    results, lock = [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    workers = [
+        Worker(url, scenario, deadline, requests_per_worker, random.Random(seed + i), results, lock)
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results, time.perf_counter() - start
+
+
+def report(results, elapsed, concurrency):
+    rows = []
+    groups = {"all": results}
+    for kind in sorted({kind for kind, _, _ in results}):
+        groups[kind] = [r for r in results if r[0] == kind]
+    for kind, group in groups.items():
+        ok = [latency for _, latency, status in group if status and status < 400]
+        statuses = {}
+        for _, _, status in group:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        rows.append(summarize(
+            f"{kind} c={concurrency}", ok, elapsed, errors=len(group) - len(ok),
+            concurrency=concurrency, statuses=statuses,
+        ))
+    return rows
+
+
+def wait_ready(url, timeout):
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=2)
+            conn.request("GET", "/health/ready")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def spawn_server(url, stub_delay_ms):
+    """Local uvicorn on a throwaway SQLite DB with the stub LLM (no Gemini calls or API key)"""
+    port = urlsplit(url).port or 8000
+    db_path = os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "tickets.db")
+    env = dict(os.environ, LLM_PROVIDER="stub", STUB_LLM_DELAY_MS=str(stub_delay_ms), DATABASE_URL=f"sqlite:///{db_path}")
+    print(f"Starting uvicorn on port {port} (stub LLM, {db_path})...", flush=True)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def parse_mix(mix):
+    """'predict=1,list=4' -> {'predict': 1.0, 'list': 4.0}"""
+    scenario = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("predict", "list"):
+            raise argparse.ArgumentTypeError(f"Unknown request kind '{kind}', expected predict or list")
+        scenario[kind] = float(weight or 1)
+    return scenario
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP load test for /api/predict and /api/tickets")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start a local server with the stub LLM and a temp DB")
+    parser.add_argument("--stub-delay-ms", type=float, default=200, help="simulated LLM latency for --spawn")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("predict=1,list=1"))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument("--requests", type=int, default=0, help="stop each connection after N requests (0 = duration only)")
+    parser.add_argument("--seed", type=int, default=1234)
+    add_output_args(parser)
+    args = parser.parse_args()
+
+    server = spawn_server(args.url, args.stub_delay_ms) if args.spawn else None
+    try:
+        if not wait_ready(args.url, timeout=300):
+            print(f"❌ {args.url} did not become ready", flush=True)
+            sys.exit(1)
+
+        results = []
+        for concurrency in args.concurrency:
+            print(f"Running {args.duration:.0f}s at concurrency {concurrency}...", flush=True)
+            raw, elapsed = run_load(args.url, args.mix, concurrency, args.duration, args.requests, args.seed)
+            results.extend(report(raw, elapsed, concurrency))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    config = {
+        "url": args.url,
+        "spawned": args.spawn,
+        "stub_delay_ms": args.stub_delay_ms if args.spawn else None,
+        "mix": args.mix,
+        "duration_s": args.duration,
+    }
+    finish(args, "loadtest", config, results)
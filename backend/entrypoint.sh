@@ -3,10 +3,11 @@ set -e
 
 echo "🚀 Starting Shanyan AI Backend..."
 
-# Check if model is already trained
+# Check if model is already trained (versioned registry, or the legacy single model directory)
 MODEL_PATH="/app/training/models/fine_tuned_bert/config.json"
+REGISTRY_CURRENT="/app/training/models/registry/CURRENT"
 
-if [ ! -f "$MODEL_PATH" ]; then
+if [ ! -f "$MODEL_PATH" ] && [ ! -f "$REGISTRY_CURRENT" ]; then
     echo "📦 No trained model found. Starting model training..."
     echo "⏳ This may take 10-30 minutes on first run..."
     cd /app
@@ -17,15 +18,20 @@ else
 fi
 
 # Start the backend server in the background
+# WEB_CONCURRENCY > 1 runs several workers under gunicorn (see gunicorn.conf.py)
 echo "🌐 Starting FastAPI server on port 8000..."
 cd /app
-uvicorn app.main:app --host 0.0.0.0 --port 8000 &
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+    gunicorn -c gunicorn.conf.py app.main:app &
+else
+    uvicorn app.main:app --host 0.0.0.0 --port 8000 &
+fi
 SERVER_PID=$!
 
-# Wait for server to be ready
-echo "⏳ Waiting for server to start..."
-for i in $(seq 1 30); do
-    if curl -s http://localhost:8000/ > /dev/null 2>&1; then
+# Wait until the model is loaded and warmed up (not just until the port answers)
+echo "⏳ Waiting for server to become ready..."
+for i in $(seq 1 90); do
+    if curl -sf http://localhost:8000/health/ready > /dev/null 2>&1; then
         echo "✅ Server is ready!"
         break
     fi
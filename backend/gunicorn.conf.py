@@ -0,0 +1,17 @@
+# Multi-worker serving: gunicorn -c gunicorn.conf.py app.main:app
+# With PRELOAD_MODEL=true the app (and model weights) are loaded once in the master
+# and shared copy-on-write with the forked workers. Warm-up still runs per worker,
+# after the fork, so no torch thread pool is started in the master.
+import os
+
+bind = "0.0.0.0:8000"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_MODEL", "false").lower() == "true"
+timeout = 120
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (create_all at import) must not be shared with workers
+    from app.db import engine
+    engine.dispose(close=False)
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from collections import Counter
+
+from preprocess import clean_text, clean_series, tokenize, build_vocab, tokenize_matrix
+from dataset_cache import load_raw_frame
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def legacy_path(bodies, max_words, max_len):
+    """The original row-by-row implementation, kept for comparison"""
+    cleaned, t_clean = timed(lambda: bodies.apply(clean_text))
+
+    def vocab():
+        word_counts = Counter(" ".join(cleaned).split())
+        word_to_idx = {word: i+2 for i, (word, count) in enumerate(word_counts.most_common(max_words))}
+        word_to_idx["<PAD>"] = 0
+        word_to_idx["<UNK>"] = 1
+        return word_to_idx
+    word_to_idx, t_vocab = timed(vocab)
+
+    X, t_tok = timed(lambda: np.array(cleaned.apply(lambda x: tokenize(x, word_to_idx, max_len)).tolist()))
+    return cleaned, word_to_idx, X, (t_clean, t_vocab, t_tok)
+
+
+def vectorized_path(bodies, max_words, max_len, workers):
+    cleaned, t_clean = timed(clean_series, bodies, workers=workers)
+    word_to_idx, t_vocab = timed(build_vocab, cleaned, max_words, workers=workers)
+    X, t_tok = timed(tokenize_matrix, cleaned, word_to_idx, max_len, workers=workers)
+    return cleaned, word_to_idx, X, (t_clean, t_vocab, t_tok)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark training/preprocess.py: row-by-row vs vectorized")
+    parser.add_argument("--repeat", type=int, default=1, help="concatenate the corpus N times to simulate a larger one")
+    parser.add_argument("--max-words", type=int, default=10000)
+    parser.add_argument("--max-len", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    bodies = load_raw_frame()['body']
+    bodies = pd.concat([bodies] * args.repeat, ignore_index=True)
+    print(f"Benchmarking on {len(bodies)} tickets (max_words={args.max_words}, max_len={args.max_len})", flush=True)
+
+    legacy = legacy_path(bodies, args.max_words, args.max_len)
+    results = [("legacy", legacy), ("vectorized", vectorized_path(bodies, args.max_words, args.max_len, 1))]
+    if args.workers > 1:
+        results.append((f"vectorized x{args.workers}", vectorized_path(bodies, args.max_words, args.max_len, args.workers)))
+
+    print(f"{'path':<16} {'clean':>8} {'vocab':>8} {'tokenize':>9} {'total':>8}  speed-up  X dtype / MB")
+    legacy_total = sum(legacy[3])
+    for name, (_, _, X, timings) in results:
+        total = sum(timings)
+        print(f"{name:<16} " + " ".join(f"{t:7.2f}s" for t in timings) + f" {total:7.2f}s  {legacy_total / total:7.2f}x"
+              f"  {X.dtype} / {X.nbytes / 2**20:.1f}")
+
+    # Same cleaned text, vocabulary and ids as the original implementation
+    for name, (cleaned, word_to_idx, X, _) in results[1:]:
+        same = cleaned.tolist() == legacy[0].tolist() and word_to_idx == legacy[1] and np.array_equal(X, legacy[2])
+        print(f"{name}: {'✅ identical output' if same else '❌ output differs from legacy path'}", flush=True)
+        if not same:
+            sys.exit(1)
@@ -0,0 +1,196 @@
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+DATASET_NAME = "Tobi-Bueck/customer-support-tickets"
+TRAINING_DIR = os.path.dirname(os.path.abspath(__file__))
+# Prepared (filtered, label-encoded, tokenized) datasets, one directory per config
+CACHE_DIR = os.getenv("TRAINING_CACHE_DIR", os.path.join(TRAINING_DIR, "data_cache"))
+# Offline mode: read tickets from a local .parquet/.csv/.json/.jsonl file instead of the Hugging Face hub
+DATA_FILE = os.getenv("TICKETS_DATA_FILE", "")
+# Bump when the layout of prepared artifacts changes so old ones are rebuilt
+CACHE_FORMAT = 1
+# Tickets no training run sees: a seeded fraction of the prepared tickets, drawn once per data source
+# and queue set and stored in CACHE_DIR. Parity checks and model comparisons score on these.
+HELD_OUT_FRACTION = 0.1
+HELD_OUT_SEED = 1234
+
+
+def source_fingerprint(data_file=None):
+    """What the raw tickets come from - a local file is identified by its path, size and mtime"""
+    data_file = data_file or DATA_FILE
+    if not data_file:
+        return {"dataset": DATASET_NAME}
+    stat = os.stat(data_file)
+    return {"file": os.path.abspath(data_file), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def load_raw_frame(data_file=None):
+    """All tickets as a DataFrame, from the local data file if configured, else the hub"""
+    data_file = data_file or DATA_FILE
+    if not data_file:
+        from datasets import load_dataset
+
+        print(f"Loading dataset {DATASET_NAME}...", flush=True)
+        return pd.DataFrame(load_dataset(DATASET_NAME)['train'])
+
+    print(f"Loading tickets from {data_file} (offline)...", flush=True)
+    if data_file.endswith(".parquet"):
+        return pd.read_parquet(data_file)
+    if data_file.endswith(".csv"):
+        return pd.read_csv(data_file)
+    return pd.read_json(data_file, lines=data_file.endswith(".jsonl"))
+
+
+def export_raw(path):
+    """Snapshot the hub dataset to a local file for TICKETS_DATA_FILE"""
+    df = load_raw_frame(data_file="")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    elif path.endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        df.to_json(path, orient="records", lines=path.endswith(".jsonl"))
+    print(f"✅ {len(df)} tickets written to {path}", flush=True)
+
+
+def cache_path(kind, config, data_file=None):
+    key_source = {"kind": kind, "format": CACHE_FORMAT, "source": source_fingerprint(data_file), **config}
+    key = hashlib.sha1(json.dumps(key_source, sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"{kind}-{key}"), key_source
+
+
+def cached(kind, config, build, data_file=None):
+    """Return the artifact directory for (kind, config, data source), building it with
+    `build(directory)` on a miss. Built in a temp directory and renamed into place, so an
+    interrupted run never leaves a half-written artifact behind."""
+    path, key_source = cache_path(kind, config, data_file)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        print(f"Using prepared dataset {path}", flush=True)
+        return path
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        build(tmp_path)
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump(key_source, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another run finished the same artifact first
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    print(f"✅ Prepared dataset written to {path}", flush=True)
+    return path
+
+
+def tokenizer_fingerprint(tokenizer):
+    vocab = json.dumps(tokenizer.get_vocab(), sort_keys=True).encode()
+    return {
+        "name": tokenizer.name_or_path,
+        "class": type(tokenizer).__name__,
+        "vocab": hashlib.sha1(vocab).hexdigest()[:12],
+    }
+
+
+def top_queue_frame(df, top_n):
+    """Tickets with a body from the `top_n` most common queues - the rows BERT artifacts are built from"""
+    # Filter for top N categories for better quality
+    top_queues = df['queue'].value_counts().nlargest(top_n).index.tolist()
+    print(f"Top {top_n} queues: {top_queues}", flush=True)
+    df = df[df['queue'].isin(top_queues)]
+    return df.dropna(subset=['body'])
+
+
+def load_held_out(top_n=10, data_file=None):
+    """The held-out tickets as a DataFrame with columns row (position in top_queue_frame), text and queue"""
+    def build(path):
+        df = top_queue_frame(load_raw_frame(data_file), top_n)
+        rng = np.random.default_rng(HELD_OUT_SEED)
+        rows = np.sort(rng.choice(len(df), int(len(df) * HELD_OUT_FRACTION), replace=False))
+        pd.DataFrame({
+            "row": rows,
+            "text": df['body'].astype(str).to_numpy()[rows],
+            "queue": df['queue'].to_numpy()[rows],
+        }).to_json(os.path.join(path, "held_out.jsonl"), orient="records", lines=True)
+
+    config = {"top_n": top_n, "fraction": HELD_OUT_FRACTION, "seed": HELD_OUT_SEED}
+    path = cached("held_out", config, build, data_file)
+    return pd.read_json(os.path.join(path, "held_out.jsonl"), lines=True, dtype=False)
+
+
+def load_training_frame(top_n=10, data_file=None):
+    """top_queue_frame without the held-out tickets, as a DataFrame with text and queue columns
+    (for models trained on raw text, like the cascade's first stage)"""
+    held_out = load_held_out(top_n, data_file)["row"].to_numpy()
+    df = top_queue_frame(load_raw_frame(data_file), top_n)
+    keep = np.ones(len(df), dtype=bool)
+    keep[held_out] = False
+    df = df[keep]
+    return pd.DataFrame({"text": df['body'].astype(str).to_numpy(), "queue": df['queue'].to_numpy()})
+
+
+def load_tokenized_tickets(tokenizer, max_length, top_n=10, data_file=None):
+    """Tickets from the `top_n` queues, label-encoded and tokenized (unpadded) for BERT,
+    without the held-out tickets (see load_held_out).
+
+    Returns (dataset, label_encoder). The dataset is read back with load_from_disk, which
+    memory-maps the Arrow files, so later runs skip loading, filtering and tokenizing.
+    """
+    import pickle
+    from datasets import Dataset, load_from_disk
+    from sklearn.preprocessing import LabelEncoder
+
+    def build(path):
+        df = top_queue_frame(load_raw_frame(data_file), top_n)
+
+        le = LabelEncoder()
+        dataset = Dataset.from_dict({
+            "text": df['body'].astype(str).tolist(),
+            "label": le.fit_transform(df['queue']).tolist(),
+        })
+
+        def tokenize_function(examples):
+            tokenized = tokenizer(examples["text"], truncation=True, max_length=max_length)
+            tokenized["length"] = [len(ids) for ids in tokenized["input_ids"]]
+            return tokenized
+
+        print(f"Tokenizing {len(dataset)} tickets (max_length={max_length})...", flush=True)
+        dataset.map(tokenize_function, batched=True).save_to_disk(os.path.join(path, "dataset"))
+        with open(os.path.join(path, "label_encoder.pkl"), "wb") as f:
+            pickle.dump(le, f)
+
+    config = {"tokenizer": tokenizer_fingerprint(tokenizer), "max_length": max_length, "top_n": top_n}
+    path = cached("bert", config, build, data_file)
+    with open(os.path.join(path, "label_encoder.pkl"), "rb") as f:
+        label_encoder = pickle.load(f)
+    dataset = load_from_disk(os.path.join(path, "dataset"))
+    held_out = set(load_held_out(top_n, data_file)["row"].tolist())
+    return dataset.select([i for i in range(len(dataset)) if i not in held_out]), label_encoder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare cached training datasets")
+    parser.add_argument("--export-raw", metavar="PATH", help="download the hub dataset once to a local file for offline runs")
+    parser.add_argument("--prepare", action="store_true", help="build the tokenized BERT dataset ahead of training")
+    parser.add_argument("--tokenizer", default="distilbert-base-uncased")
+    args = parser.parse_args()
+
+    if args.export_raw:
+        export_raw(args.export_raw)
+    if args.prepare:
+        import sys
+        from transformers import AutoTokenizer
+
+        sys.path.insert(0, os.path.dirname(TRAINING_DIR))
+        from app.services.tokenization import MAX_LENGTH
+
+        load_tokenized_tickets(AutoTokenizer.from_pretrained(args.tokenizer), MAX_LENGTH)
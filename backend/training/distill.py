@@ -0,0 +1,351 @@
+import os
+import sys
+import json
+import shutil
+import pickle
+import argparse
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import torch
+import torch.nn.functional as F
+from transformers import (
+    AutoConfig,
+    AutoTokenizer,
+    AutoModelForSequenceClassification,
+    TrainingArguments,
+    Trainer,
+    DataCollatorWithPadding,
+)
+
+# Allow importing the serving code (backend/app) when run as `python training/distill.py`
+training_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(training_dir))
+
+from app.services.classifier import TicketClassifierService
+from app.services.linear_model import FIRST_STAGE_MODEL
+from app.services.model_registry import current_version, new_version, set_current, version_path
+from app.services.tokenization import MAX_LENGTH
+from dataset_cache import cached, load_held_out, load_tokenized_tickets
+from export_model import bert_predictions
+from train import ProgressCallback, compute_metrics
+
+REPORT_FILE = "distillation_report.json"
+
+
+def student_config(teacher_path, layers, dim, heads, num_labels):
+    """The teacher's DistilBERT config with fewer layers and a smaller hidden size"""
+    config = AutoConfig.from_pretrained(teacher_path, local_files_only=True)
+    if config.model_type != "distilbert":
+        raise ValueError(f"Only DistilBERT teachers are supported, got '{config.model_type}'")
+    if dim == config.dim:
+        # init_student copies the teacher's attention weights, which are only the same heads
+        # if they are split the same way
+        heads = heads or config.n_heads
+        if heads != config.n_heads:
+            raise ValueError(f"--dim {dim} copies teacher layers, so --heads must be the teacher's {config.n_heads}, got {heads}")
+    # Default: the teacher's head size
+    heads = heads or max(dim // (config.dim // config.n_heads), 1)
+    if dim % heads:
+        raise ValueError(f"--dim {dim} must be divisible by --heads {heads}")
+    config.n_layers = layers
+    config.dim = dim
+    config.hidden_dim = 4 * dim
+    config.n_heads = heads
+    config.num_labels = num_labels
+    return config
+
+
+def init_student(student, teacher):
+    """Start from the teacher's weights where the shapes allow it.
+
+    Same hidden size: copy the embeddings and every k-th transformer layer (as DistilBERT itself
+    was initialised from BERT). Smaller hidden size: project the teacher's token embeddings
+    onto their top principal components; the rest starts from scratch.
+    """
+    teacher_embeddings = teacher.distilbert.embeddings
+    student_embeddings = student.distilbert.embeddings
+    if student.config.dim == teacher.config.dim:
+        student_embeddings.load_state_dict(teacher_embeddings.state_dict())
+        step = max(teacher.config.n_layers // student.config.n_layers, 1)
+        for i, layer in enumerate(student.distilbert.transformer.layer):
+            layer.load_state_dict(teacher.distilbert.transformer.layer[min(i * step, teacher.config.n_layers - 1)].state_dict())
+        return "layers"
+    with torch.no_grad():
+        weights = teacher_embeddings.word_embeddings.weight
+        centered = weights - weights.mean(dim=0)
+        _, _, components = torch.pca_lowrank(centered, q=student.config.dim, center=False)
+        student_embeddings.word_embeddings.weight.copy_(centered @ components)
+    return "pca_embeddings"
+
+
+def compute_teacher_logits(teacher, tokenizer, dataset, batch_size):
+    """Teacher logits for every row, running similar-length tickets together"""
+    order = np.argsort(dataset["length"])
+    logits = np.zeros((len(dataset), teacher.config.num_labels), dtype=np.float32)
+    input_ids = dataset["input_ids"]
+    teacher.eval()
+    with torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            inputs = tokenizer.pad({"input_ids": [input_ids[i] for i in rows]}, return_tensors="pt")
+            logits[rows] = teacher(**inputs).logits.numpy()
+            if (start // batch_size) % 200 == 0:
+                print(f"   Teacher logits {start}/{len(order)}", flush=True)
+    return logits
+
+
+def cached_teacher_logits(teacher, tokenizer, dataset, teacher_path, batch_size):
+    """Computed once per (teacher weights, prepared dataset) in training/data_cache"""
+    def build(path):
+        np.save(os.path.join(path, "logits.npy"), compute_teacher_logits(teacher, tokenizer, dataset, batch_size))
+
+    config = {
+        "teacher": os.path.abspath(teacher_path),
+        "teacher_mtime": int(os.path.getmtime(os.path.join(teacher_path, "config.json"))),
+        "dataset": dataset._fingerprint,
+        "rows": len(dataset),
+    }
+    return np.load(os.path.join(cached("teacher_logits", config, build), "logits.npy"), mmap_mode="r")
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature, alpha):
+    """alpha * soft-label KL at `temperature` (scaled by T^2) + (1 - alpha) * hard-label cross-entropy"""
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=-1),
+        F.softmax(teacher_logits / temperature, dim=-1),
+        reduction="batchmean",
+    ) * temperature ** 2
+    return alpha * soft + (1 - alpha) * F.cross_entropy(student_logits, labels)
+
+
+class DistillationCollator(DataCollatorWithPadding):
+    """Pads like train.py and carries the cached teacher logits (if any) along with the batch"""
+
+    def __call__(self, features):
+        teacher_logits = [feature.pop("teacher_logits") for feature in features] if "teacher_logits" in features[0] else None
+        for feature in features:
+            feature.pop("length", None)
+            feature.pop("text", None)
+        batch = super().__call__(features)
+        if teacher_logits is not None:
+            batch["teacher_logits"] = torch.tensor(teacher_logits, dtype=torch.float32)
+        return batch
+
+
+class DistillationTrainer(Trainer):
+    def __init__(self, *args, teacher=None, temperature=2.0, alpha=0.7, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.teacher = teacher
+        self.temperature = temperature
+        self.alpha = alpha
+        self._teacher_placed = False
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        model_inputs = {key: value for key, value in inputs.items() if key not in ("labels", "teacher_logits")}
+        teacher_logits = inputs.get("teacher_logits")
+        if teacher_logits is None:
+            # Not cached: run the teacher alongside the student. Moved to the student's device on
+            # first use only, so cached runs never hold a second model on the GPU.
+            if not self._teacher_placed:
+                self.teacher.to(self.args.device).eval()
+                self._teacher_placed = True
+            with torch.no_grad():
+                teacher_logits = self.teacher(**model_inputs).logits
+        outputs = model(**model_inputs)
+        loss = distillation_loss(outputs.logits, teacher_logits, inputs["labels"], self.temperature, self.alpha)
+        return (loss, outputs) if return_outputs else loss
+
+
+def weights_size_mb(model_path):
+    return sum(
+        os.path.getsize(os.path.join(model_path, name)) for name in os.listdir(model_path)
+        if name.endswith((".safetensors", ".bin"))
+    ) / 2 ** 20
+
+
+def measure_memory(path, texts, batch_size):
+    """Run in a fresh process: peak resident memory (MB) above the post-import baseline after
+    loading the model, and after classifying `texts` at `batch_size`"""
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    service = TicketClassifierService(backend="torch", model_path=path)
+    loaded = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    bert_predictions(service, texts, batch_size)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round((loaded - baseline) * unit / 2 ** 20, 1), round((peak - baseline) * unit / 2 ** 20, 1)
+
+
+def compare(teacher_path, student_path, texts, labels, batch_sizes):
+    """Accuracy, agreement, serving latency and resident memory of both models through TicketClassifierService"""
+    report = {"samples": len(texts)}
+    predictions = {}
+    for name, path in (("teacher", teacher_path), ("student", student_path)):
+        # Each model in its own process, so neither the other model nor this one's allocator
+        # history skews the numbers
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            load_mb, peak_mb = pool.submit(measure_memory, path, texts, max(batch_sizes)).result()
+        service = TicketClassifierService(backend="torch", model_path=path)
+        service.warmup()
+        model = service.backend.model
+        entry = {
+            "path": path,
+            "layers": model.config.n_layers,
+            "dim": model.config.dim,
+            "parameters": sum(p.numel() for p in model.parameters()),
+            "weights_mb": round(weights_size_mb(path), 1),
+            "load_rss_mb": load_mb,
+            "peak_rss_mb": peak_mb,
+            "rss_batch_size": max(batch_sizes),
+            "latency_ms_per_ticket": {},
+        }
+        for batch_size in batch_sizes:
+            preds, ms = bert_predictions(service, texts, batch_size)
+            entry["latency_ms_per_ticket"][str(batch_size)] = round(ms, 3)
+        predictions[name] = preds
+        entry["accuracy"] = round(float((preds == labels).mean()), 4)
+        report[name] = entry
+    report["agreement"] = round(float((predictions["teacher"] == predictions["student"]).mean()), 4)
+    report["speedup"] = {
+        batch_size: round(report["teacher"]["latency_ms_per_ticket"][batch_size] / ms, 2)
+        for batch_size, ms in report["student"]["latency_ms_per_ticket"].items()
+    }
+    report["size_ratio"] = round(report["teacher"]["parameters"] / report["student"]["parameters"], 2)
+    report["memory_ratio"] = round(report["teacher"]["peak_rss_mb"] / max(report["student"]["peak_rss_mb"], 0.1), 2)
+    return report
+
+
+def print_report(report):
+    print(f"Teacher vs student on {report['samples']} held-out tickets", flush=True)
+    for name in ("teacher", "student"):
+        entry = report[name]
+        latency = ", ".join(f"batch {size}: {ms:.2f} ms" for size, ms in entry["latency_ms_per_ticket"].items())
+        print(f"   {name:<7} {entry['layers']} layers x {entry['dim']}  {entry['parameters'] / 1e6:.1f}M params  "
+              f"{entry['weights_mb']:.0f} MB weights  {entry['peak_rss_mb']:.0f} MB RSS (batch {entry['rss_batch_size']})  "
+              f"accuracy {entry['accuracy']:.4f}  ({latency})", flush=True)
+    speedup = ", ".join(f"batch {size}: {ratio:.2f}x" for size, ratio in report["speedup"].items())
+    print(f"   agreement {report['agreement']:.4f}  size {report['size_ratio']:.1f}x smaller  "
+          f"memory {report['memory_ratio']:.1f}x smaller  speed-up {speedup}", flush=True)
+
+
+def distill(args):
+    teacher_version = args.teacher or current_version()
+    teacher_path = version_path(teacher_version)
+    tokenizer = AutoTokenizer.from_pretrained(teacher_path, local_files_only=True)
+    teacher = AutoModelForSequenceClassification.from_pretrained(teacher_path, local_files_only=True)
+    teacher.eval()
+    with open(os.path.join(teacher_path, "label_encoder.pkl"), "rb") as f:
+        teacher_encoder = pickle.load(f)
+
+    # 1. The full prepared dataset (no Docker sampling: the student is cheap to train)
+    dataset, label_encoder = load_tokenized_tickets(tokenizer, MAX_LENGTH, top_n=len(teacher_encoder.classes_))
+    if label_encoder.classes_.tolist() != teacher_encoder.classes_.tolist():
+        sys.exit(f"❌ Dataset queues {label_encoder.classes_.tolist()} don't match the teacher's "
+                 f"{teacher_encoder.classes_.tolist()}")
+    if args.max_samples and len(dataset) > args.max_samples:
+        dataset = dataset.shuffle(seed=42).select(range(args.max_samples))
+
+    # 2. Teacher soft labels, cached so later runs (other student sizes) skip the teacher pass
+    if args.cache_teacher_logits:
+        logits = cached_teacher_logits(teacher, tokenizer, dataset, teacher_path, args.teacher_batch_size)
+        dataset = dataset.add_column("teacher_logits", np.asarray(logits).tolist())
+    splits = dataset.train_test_split(test_size=0.1, seed=42)
+
+    # 3. Student
+    config = student_config(teacher_path, args.layers, args.dim, args.heads, len(teacher_encoder.classes_))
+    student = AutoModelForSequenceClassification.from_config(config)
+    init = init_student(student, teacher)
+    print(f"Student: {args.layers} layers x {args.dim} ({init} init) - "
+          f"{sum(p.numel() for p in student.parameters()) / 1e6:.1f}M vs "
+          f"{sum(p.numel() for p in teacher.parameters()) / 1e6:.1f}M teacher params", flush=True)
+
+    training_args = TrainingArguments(
+        output_dir="./results",
+        num_train_epochs=args.epochs,
+        per_device_train_batch_size=args.batch_size,
+        per_device_eval_batch_size=args.batch_size,
+        learning_rate=args.learning_rate,
+        warmup_ratio=0.06,
+        weight_decay=0.01,
+        logging_steps=50,
+        eval_strategy="epoch",
+        save_strategy="no",
+        group_by_length=True,
+        # teacher_logits has to reach compute_loss; the collator drops the columns the model can't take
+        remove_unused_columns=False,
+        disable_tqdm=True,
+    )
+    trainer = DistillationTrainer(
+        model=student,
+        args=training_args,
+        train_dataset=splits["train"],
+        eval_dataset=splits["test"],
+        compute_metrics=compute_metrics,
+        data_collator=DistillationCollator(tokenizer=tokenizer),
+        callbacks=[ProgressCallback()],
+        teacher=teacher,
+        temperature=args.temperature,
+        alpha=args.alpha,
+    )
+    print(f"Distilling on {len(splits['train'])} tickets for {args.epochs} epoch(s) "
+          f"(T={args.temperature}, alpha={args.alpha})...", flush=True)
+    trainer.train()
+
+    # 4. A regular registry version: the service loads it like any fine-tuned model
+    version, save_path = new_version()
+    student.save_pretrained(save_path)
+    tokenizer.save_pretrained(save_path)
+    shutil.copy(os.path.join(teacher_path, "label_encoder.pkl"), save_path)
+    if os.path.exists(os.path.join(teacher_path, FIRST_STAGE_MODEL)):
+        # The cascade's first stage doesn't depend on the transformer, keep the teacher's
+        shutil.copy(os.path.join(teacher_path, FIRST_STAGE_MODEL), save_path)
+
+    # 5. Report on the held-out tickets, which neither the teacher nor the student trained on
+    held_out = load_held_out(top_n=len(teacher_encoder.classes_)).head(args.report_samples)
+    labels = teacher_encoder.transform(held_out["queue"])
+    report = compare(teacher_path, save_path, held_out["text"].tolist(), labels, args.report_batch_sizes)
+    report.update({
+        "teacher_version": teacher_version,
+        "student_version": version,
+        "temperature": args.temperature,
+        "alpha": args.alpha,
+        "epochs": args.epochs,
+        "train_rows": len(splits["train"]),
+        "init": init,
+    })
+    with open(os.path.join(save_path, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"✅ Student saved as model version {version} ({os.path.join(save_path, REPORT_FILE)})", flush=True)
+
+    if args.promote:
+        set_current(version)
+        print(f"✅ {version} is now the current version - running servers hot-swap to it", flush=True)
+    else:
+        print(f"   Serve it with POST /api/admin/models/{version}/activate or --promote", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill the fine-tuned classifier into a smaller student model")
+    parser.add_argument("--teacher", default=None, help="teacher registry version (default: current)")
+    parser.add_argument("--layers", type=int, default=3)
+    parser.add_argument("--dim", type=int, default=384, help="student hidden size (768 copies teacher layers)")
+    parser.add_argument("--heads", type=int, default=None,
+                        help="attention heads (default: the teacher's head size, 6 for --dim 384; must match the teacher with --dim 768)")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=1e-4)
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--alpha", type=float, default=0.7, help="weight of the soft-label loss")
+    parser.add_argument("--cache-teacher-logits", action=argparse.BooleanOptionalAction, default=True,
+                        help="precompute teacher logits once into training/data_cache (else run the teacher every step)")
+    parser.add_argument("--teacher-batch-size", type=int, default=64)
+    parser.add_argument("--max-samples", type=int, default=0, help="cap on training rows (0 = full dataset)")
+    parser.add_argument("--report-samples", type=int, default=1000)
+    parser.add_argument("--report-batch-sizes", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--promote", action="store_true", help="make the student the current version")
+    args = parser.parse_args()
+
+    distill(args)
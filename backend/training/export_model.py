@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+# Allow importing the serving code (backend/app) when run as `python training/export_model.py`
+training_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(training_dir))
+
+from app.services.classifier import TicketClassifierService
+from app.services.inference_backends import INT8_WEIGHTS, ONNX_MODEL, MMAP_WEIGHTS, quantize
+from app.services.model_registry import current_version, version_path
+from dataset_cache import load_held_out
+
+
+def export_int8(model_path):
+    model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+    model.eval()
+    quantized = quantize(model)
+    out_path = os.path.join(model_path, INT8_WEIGHTS)
+    torch.save(quantized.state_dict(), out_path)
+    print(f"✅ int8 weights written to {out_path}", flush=True)
+
+
+def export_mmap(model_path):
+    model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+    out_path = os.path.join(model_path, MMAP_WEIGHTS)
+    torch.save(model.state_dict(), out_path)
+    print(f"✅ mmap-loadable fp32 weights written to {out_path}", flush=True)
+
+
+def export_onnx(model_path):
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+    model.eval()
+    dummy = tokenizer(["export sample ticket"], return_tensors="pt", padding=True, truncation=True, max_length=128)
+    out_path = os.path.join(model_path, ONNX_MODEL)
+    torch.onnx.export(
+        model,
+        (dummy["input_ids"], dummy["attention_mask"]),
+        out_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=17,
+    )
+    print(f"✅ ONNX graph written to {out_path}", flush=True)
+
+
+def held_out_sample(label_encoder, samples):
+    """Up to `samples` of the held-out tickets no training run sees (see dataset_cache.load_held_out)"""
+    df = load_held_out(top_n=len(label_encoder.classes_))
+    df = df[df['queue'].isin(label_encoder.classes_)]
+    df = df.sample(n=min(samples, len(df)), random_state=1234)
+    return df['text'].tolist(), df['queue'].tolist()
+
+
+def bert_predictions(service, texts, batch_size):
+    """Runs only the model path (no keyword pre-filter) so backends are compared like for like"""
+    preds = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        preds.extend(service.logits(texts[i:i + batch_size]).argmax(axis=1).tolist())
+    elapsed = time.perf_counter() - start
+    return np.array(preds), elapsed / len(texts) * 1000
+
+
+def check_parity(model_path, backend, samples, batch_size):
+    reference = TicketClassifierService(backend="torch", model_path=model_path)
+    candidate = TicketClassifierService(backend=backend, model_path=model_path)
+
+    texts, queues = held_out_sample(reference.label_encoder, samples)
+    labels = reference.label_encoder.transform(queues)
+
+    ref_preds, ref_ms = bert_predictions(reference, texts, batch_size)
+    new_preds, new_ms = bert_predictions(candidate, texts, batch_size)
+
+    agreement = float((ref_preds == new_preds).mean())
+    print(f"Parity check on {len(texts)} held-out tickets (batch_size={batch_size})", flush=True)
+    print(f"   fp32   accuracy: {(ref_preds == labels).mean():.4f}  latency: {ref_ms:.2f} ms/ticket", flush=True)
+    print(f"   {backend:<6} accuracy: {(new_preds == labels).mean():.4f}  latency: {new_ms:.2f} ms/ticket", flush=True)
+    print(f"   agreement with fp32: {agreement:.4f}  speed-up: {ref_ms / new_ms:.2f}x", flush=True)
+    return agreement
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export optimized CPU inference artifacts for the fine-tuned model")
+    # mmap is not a separate backend: it is the shared-memory weight format for CLASSIFIER_BACKEND=torch
+    parser.add_argument("--backend", choices=["int8", "onnx", "mmap", "all"], default="all")
+    parser.add_argument("--model-path", default=None, help="defaults to the current registry version")
+    parser.add_argument("--check", action="store_true", help="compare predictions against the fp32 model")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    args = parser.parse_args()
+    args.model_path = args.model_path or version_path(current_version())
+
+    backends = ["int8", "onnx", "mmap"] if args.backend == "all" else [args.backend]
+    for name in backends:
+        if name == "int8":
+            export_int8(args.model_path)
+        elif name == "onnx":
+            export_onnx(args.model_path)
+        else:
+            export_mmap(args.model_path)
+    # mmap weights are loaded by the torch backend
+    backends = ["torch" if name == "mmap" else name for name in backends]
+
+    if args.check:
+        failed = [name for name in backends
+                  if check_parity(args.model_path, name, args.samples, args.batch_size) < args.min_agreement]
+        if failed:
+            print(f"❌ Agreement below {args.min_agreement} for: {', '.join(failed)}", flush=True)
+            sys.exit(1)
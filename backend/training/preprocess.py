@@ -1,12 +1,18 @@
+import os
 import pandas as pd
 import numpy as np
 import re
 import pickle
 import torch
-from datasets import load_dataset
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+from dataset_cache import load_raw_frame, cached
+
+# Processes used for cleaning, vocabulary counting and tokenizing (chunks of 20k tickets)
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "1"))
 
 def clean_text(text):
     if not isinstance(text, str):
@@ -16,6 +22,43 @@ def clean_text(text):
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
+# clean_text as byte-level C operations: lowercase, drop everything but a-z and whitespace,
+# collapse whitespace. Non-ASCII whitespace is turned into spaces first; other non-ASCII
+# characters are dropped by the ASCII encode, exactly as the regex in clean_text drops them.
+_WHITESPACE = re.compile(r'\s')
+_ASCII_WHITESPACE = bytes(c for c in range(128) if chr(c).isspace())
+_TO_SPACE = bytes.maketrans(_ASCII_WHITESPACE, b' ' * len(_ASCII_WHITESPACE))
+_NOT_LETTER = bytes(c for c in range(128) if not (chr(c).isspace() or ord('a') <= c <= ord('z')))
+
+def clean_fast(text):
+    if not isinstance(text, str):
+        return ""
+    text = text.lower()
+    if not text.isascii():
+        text = _WHITESPACE.sub(' ', text)
+    return ' '.join(text.encode('ascii', 'ignore').translate(_TO_SPACE, _NOT_LETTER).decode().split())
+
+def _chunks(items, chunk_size):
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+def _map_chunks(fn, items, workers, chunk_size, initializer=None, initargs=()):
+    """fn over consecutive chunks of `items`, results in chunk order; processes when workers > 1"""
+    chunks = _chunks(items, chunk_size)
+    if workers <= 1 or len(chunks) <= 1:
+        if initializer:
+            initializer(*initargs)
+        return [fn(chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        return list(pool.map(fn, chunks))
+
+def _clean_chunk(texts):
+    return [clean_fast(text) for text in texts]
+
+def clean_series(texts, workers=1, chunk_size=20000):
+    """clean_text over a whole column, same output"""
+    cleaned = _map_chunks(_clean_chunk, texts.tolist(), workers, chunk_size)
+    return pd.Series(list(chain.from_iterable(cleaned)), index=texts.index)
+
 def tokenize(text, word_to_idx, max_len):
     tokens = text.split()
     indexed = [word_to_idx.get(token, 1) for token in tokens] # 1 for <UNK>
@@ -25,39 +68,104 @@ def tokenize(text, word_to_idx, max_len):
         indexed = indexed[:max_len]
     return indexed
 
-def prepare_data(max_words=10000, max_len=100):
-    print("Loading dataset...")
-    dataset = load_dataset("Tobi-Bueck/customer-support-tickets")
-    df = pd.DataFrame(dataset['train'])
+def _count_chunk(texts):
+    return Counter(chain.from_iterable(map(str.split, texts)))
+
+def build_vocab(texts, max_words, workers=1, chunk_size=20000):
+    """Stream word counts ticket by ticket (never joins the corpus into one string).
+    Chunk counts are merged in order, so ties keep first-seen order - the same
+    vocabulary as Counter over the joined corpus."""
+    word_counts = Counter()
+    for counts in _map_chunks(_count_chunk, list(texts), workers, chunk_size):
+        word_counts.update(counts)
+    most_common_words = [word for word, count in word_counts.most_common(max_words)]
+    word_to_idx = {word: i+2 for i, word in enumerate(most_common_words)}
+    word_to_idx["<PAD>"] = 0
+    word_to_idx["<UNK>"] = 1
+    return word_to_idx
+
+_vocab = {}
+
+def _set_vocab(word_to_idx, max_len):
+    _vocab['word_to_idx'], _vocab['max_len'] = word_to_idx, max_len
+
+def _tokenize_chunk(texts):
+    """Ids of one chunk as (flat int32 ids, tokens per row) - turned into rows by tokenize_matrix"""
+    max_len = _vocab['max_len']
+    tokens = []
+    lengths = np.empty(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        words = text.split()[:max_len]
+        tokens.extend(words)
+        lengths[i] = len(words)
+    ids = np.fromiter(map(_vocab['word_to_idx'].get, tokens, repeat(1)), dtype=np.int32, count=len(tokens)) # 1 for <UNK>
+    return ids, lengths
+
+def tokenize_matrix(texts, word_to_idx, max_len, workers=1, chunk_size=20000):
+    """Tokenize all texts straight into one preallocated (n, max_len) int32 matrix, 0-padded"""
+    texts = list(texts)
+    X = np.zeros((len(texts), max_len), dtype=np.int32)
+    positions = np.arange(max_len)
+    start = 0
+    for ids, lengths in _map_chunks(_tokenize_chunk, texts, workers, chunk_size, _set_vocab, (word_to_idx, max_len)):
+        block = X[start:start + len(lengths)]
+        # Row-major boolean mask: the first `length` slots of each row, in the same order as ids
+        block[positions < lengths[:, None]] = ids
+        start += len(lengths)
+    return X
+
+def load_tickets(top_n=10, workers=1):
+    """Load the dataset, clean the text and keep the `top_n` most frequent queues.
+    Returns a DataFrame with the raw `text`, cleaned `body` and `queue` columns."""
+    df = load_raw_frame()
+    df['text'] = df['body'].fillna('').astype(str)
     
     print("Preprocessing text...")
-    df['body'] = df['body'].apply(clean_text)
+    df['body'] = clean_series(df['body'], workers=workers)
     
     # Filter out empty or very short bodies
     df = df[df['body'].str.len() > 10]
     
     # We might want to limit to top queues if 52 is too many, but let's try to keep the most frequent ones
-    top_queues = df['queue'].value_counts().nlargest(10).index.tolist()
-    print(f"Top 10 queues: {top_queues}")
+    top_queues = df['queue'].value_counts().nlargest(top_n).index.tolist()
+    print(f"Top {top_n} queues: {top_queues}")
     df = df[df['queue'].isin(top_queues)]
+    return df, top_queues
+
+def build_arrays(path, max_words, max_len, top_n, workers=1):
+    df, top_queues = load_tickets(top_n, workers)
     
     print("Encoding labels...")
     le = LabelEncoder()
     df['queue_encoded'] = le.fit_transform(df['queue'])
     
     print("Building vocabulary...")
-    all_words = " ".join(df['body']).split()
-    word_counts = Counter(all_words)
-    most_common_words = [word for word, count in word_counts.most_common(max_words)]
-    word_to_idx = {word: i+2 for i, word in enumerate(most_common_words)}
-    word_to_idx["<PAD>"] = 0
-    word_to_idx["<UNK>"] = 1
+    word_to_idx = build_vocab(df['body'], max_words, workers=workers)
     
     print("Tokenizing...")
-    df['tokenized'] = df['body'].apply(lambda x: tokenize(x, word_to_idx, max_len))
+    X = tokenize_matrix(df['body'], word_to_idx, max_len, workers=workers)
     
-    X = np.array(df['tokenized'].tolist())
-    y = np.array(df['queue_encoded'].tolist())
+    np.save(os.path.join(path, 'X.npy'), X)
+    np.save(os.path.join(path, 'y.npy'), df['queue_encoded'].to_numpy())
+    with open(os.path.join(path, 'tokenizer.pkl'), 'wb') as f:
+        pickle.dump(word_to_idx, f)
+    with open(os.path.join(path, 'label_encoder.pkl'), 'wb') as f:
+        pickle.dump(le, f)
+
+def prepare_data(max_words=10000, max_len=100, top_n=10, workers=PREPROCESS_WORKERS):
+    # Built once per config and data source under training/data_cache (see dataset_cache.py),
+    # later runs memory-map the arrays instead of reloading and re-tokenizing the corpus
+    path = cached(
+        "vocab",
+        {"max_words": max_words, "max_len": max_len, "top_n": top_n},
+        lambda path: build_arrays(path, max_words, max_len, top_n, workers),
+    )
+    X = np.load(os.path.join(path, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(path, 'y.npy'), mmap_mode='r')
+    with open(os.path.join(path, 'tokenizer.pkl'), 'rb') as f:
+        word_to_idx = pickle.load(f)
+    with open(os.path.join(path, 'label_encoder.pkl'), 'rb') as f:
+        le = pickle.load(f)
     
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
@@ -67,7 +175,7 @@ def prepare_data(max_words=10000, max_len=100):
     with open('backend/training/label_encoder.pkl', 'wb') as f:
         pickle.dump(le, f)
         
-    return X_train, X_test, y_train, y_test, len(word_to_idx), len(top_queues), max_len
+    return X_train, X_test, y_train, y_test, len(word_to_idx), len(le.classes_), max_len
 
 if __name__ == "__main__":
     prepare_data()
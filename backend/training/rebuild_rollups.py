@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+
+# Allow importing the serving code (backend/app) when run as `python training/rebuild_rollups.py`
+training_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(training_dir))
+
+from sqlalchemy import func
+from app.db import Base, SessionLocal, engine
+from app.models import Ticket, TicketRollup
+from app.services.rollups import ROLLUP_FIELDS, backfill, ticket_key
+
+
+def count_tickets(max_id, chunk_size):
+    """Rollup counts of tickets up to max_id, read in id-ordered keyset chunks"""
+    counts = Counter()
+    last_id = 0
+    scanned = 0
+    start = time.perf_counter()
+    while True:
+        with SessionLocal() as db:
+            rows = db.query(*ROLLUP_FIELDS).filter(Ticket.id > last_id, Ticket.id <= max_id) \
+                .order_by(Ticket.id).limit(chunk_size).all()
+        if not rows:
+            return counts
+        counts.update(ticket_key(row) for row in rows)
+        last_id = rows[-1].id
+        scanned += len(rows)
+        print(f"   {scanned} tickets counted, last id {last_id}/{max_id} "
+              f"({scanned / (time.perf_counter() - start):.0f} tickets/s)", flush=True)
+
+
+def current_rollups(db):
+    return Counter({
+        (row.assigned_department, row.predicted_queue, row.status, row.day): row.count
+        for row in db.query(TicketRollup).filter(TicketRollup.count != 0)
+    })
+
+
+def dry_run(args):
+    """Compare a fresh count with the stored rows without locking anything - tickets written
+    during the scan can show up as small, transient differences"""
+    with SessionLocal() as db:
+        max_id = db.query(func.max(Ticket.id)).scalar() or 0
+    print(f"Counting tickets 1..{max_id} in chunks of {args.chunk_size}...", flush=True)
+    counts = count_tickets(max_id, args.chunk_size)
+    with SessionLocal() as db:
+        counts.update(ticket_key(row) for row in db.query(*ROLLUP_FIELDS).filter(Ticket.id > max_id))
+        current = current_rollups(db)
+
+    drift = {key: counts[key] - current[key] for key in counts.keys() | current.keys() if counts[key] != current[key]}
+    print(f"✅ {sum(counts.values())} tickets in {len(counts)} rollup rows; "
+          f"{len(drift)} row(s) differ from ticket_rollups", flush=True)
+    for (department, queue, status, day), change in sorted(drift.items(), key=lambda item: -abs(item[1]))[:args.top]:
+        print(f"   {change:+8d}  {day} {department or '-'} / {queue or '-'} / {status.value}", flush=True)
+
+
+def rebuild(args):
+    Base.metadata.create_all(bind=engine, tables=[TicketRollup.__table__])
+    if args.dry_run:
+        return dry_run(args)
+
+    # Count and write in one transaction holding the table lock (see rollups.backfill): a status
+    # change or queue move committed during the scan can't land on rows that are then replaced.
+    # Ticket writes wait for it to finish.
+    print(f"Recounting tickets in chunks of {args.chunk_size} (ticket writes wait until this commits)...", flush=True)
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        total = backfill(db, args.chunk_size)
+        rows = db.query(TicketRollup).filter(TicketRollup.count != 0).count()
+        db.commit()
+    print(f"✅ ticket_rollups rebuilt: {total} tickets in {rows} rows ({time.perf_counter() - start:.1f}s)", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the dashboard rollup table from the tickets table")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="tickets per keyset read")
+    parser.add_argument("--dry-run", action="store_true", help="only report how the stored rollups differ")
+    parser.add_argument("--top", type=int, default=20, help="differing rows to print with --dry-run")
+    args = parser.parse_args()
+
+    rebuild(args)
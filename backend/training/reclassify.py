@@ -0,0 +1,261 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Allow importing the serving code (backend/app) when run as `python training/reclassify.py`
+training_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(training_dir))
+
+# Never write backfill results into the shared disk cache the live workers read
+os.environ["CLASSIFIER_DISK_CACHE"] = ""
+
+from sqlalchemy import func, or_, update
+from app.db import SessionLocal
+from app.models import Ticket, TicketStatus
+from app.departments import DEPARTMENT_MAPPING
+from app.services.classifier import TicketClassifierService
+from app.services.model_registry import current_version, version_path
+from app.services.rollups import apply_deltas, record_move, rollup_key
+
+REPORT_FIELDS = [
+    "id", "ticket_number", "status", "old_queue", "new_queue",
+    "old_department", "new_department", "old_model_version",
+]
+
+# One classifier per worker process, loaded by the pool initializer
+_service = None
+
+
+def _init_worker(model_path, backend, nice):
+    global _service
+    if nice:
+        os.nice(nice)
+    _service = TicketClassifierService(backend=backend, model_path=model_path)
+
+
+def _classify(texts, batch_size):
+    """Runs in a worker process: (label, model_version) per text, `batch_size` per forward pass"""
+    results = []
+    for i in range(0, len(texts), batch_size):
+        results.extend(_service.predict_batch_with_version(texts[i:i + batch_size]))
+    return results
+
+
+def load_checkpoint(path, version, dry_run, restart):
+    """Resume state for this run, or a fresh one. A checkpoint from another version/mode is an error."""
+    if restart or not os.path.exists(path):
+        return {"version": version, "dry_run": dry_run, "max_id": None, "last_id": 0,
+                "scanned": 0, "changed": 0, "transitions": {}, "finished": False}
+    with open(path) as f:
+        state = json.load(f)
+    if state["version"] != version or state["dry_run"] != dry_run:
+        mode = "dry run" if state["dry_run"] else "apply"
+        sys.exit(f"❌ {path} belongs to a {mode} of {state['version']} - pass --restart or another --checkpoint")
+    return state
+
+
+def save_checkpoint(path, state):
+    state["updated_at"] = datetime.utcnow().isoformat()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_chunk(last_id, max_id, version, args):
+    """Next keyset chunk in id order - each read is a short, indexed range query"""
+    with SessionLocal() as db:
+        query = db.query(
+            Ticket.id, Ticket.ticket_number, Ticket.body, Ticket.status, Ticket.predicted_queue,
+            Ticket.assigned_department, Ticket.model_version, Ticket.created_at,
+        ).filter(Ticket.id > last_id, Ticket.id <= max_id)
+        if not args.all:
+            query = query.filter(or_(Ticket.model_version.is_(None), Ticket.model_version != version))
+        if args.status:
+            query = query.filter(Ticket.status.in_([TicketStatus(status) for status in args.status]))
+        return query.order_by(Ticket.id).limit(args.chunk_size).all()
+
+
+def apply_updates(rows, predictions, version):
+    """One short transaction per chunk. Changed tickets move queue and department (and their
+    dashboard rollup counts); unchanged ones only record the version that re-scored them
+    (keeping their updated_at)."""
+    changed, moved, unchanged = [], [], []
+    now = datetime.utcnow()
+    for row, (queue, _) in zip(rows, predictions):
+        if queue != row.predicted_queue:
+            department = DEPARTMENT_MAPPING.get(queue, "sales")
+            changed.append({
+                "id": row.id,
+                "predicted_queue": queue,
+                "assigned_department": department,
+                "model_version": version,
+                "updated_at": now,
+            })
+            moved.append((row, department, queue))
+        else:
+            unchanged.append(row.id)
+    with SessionLocal() as db:
+        if changed:
+            db.execute(update(Ticket), changed)
+            # Status as of this transaction, not read_chunk: the UPDATE above holds the rows (on
+            # SQLite, the write lock), so a status change committed since then can't be missed
+            statuses = dict(db.query(Ticket.id, Ticket.status).filter(Ticket.id.in_([row.id for row, _, _ in moved])))
+            deltas = Counter()
+            for row, department, queue in moved:
+                status = statuses[row.id]
+                record_move(
+                    deltas,
+                    rollup_key(row.assigned_department, row.predicted_queue, status, row.created_at),
+                    rollup_key(department, queue, status, row.created_at),
+                )
+            apply_deltas(db, deltas)
+        if unchanged:
+            db.execute(
+                update(Ticket).where(Ticket.id.in_(unchanged)).values(model_version=version, updated_at=Ticket.updated_at)
+            )
+        db.commit()
+
+
+def reclassify(args):
+    model_path = args.model_path or version_path(args.version or current_version())
+    version = os.path.basename(model_path.rstrip(os.sep))
+    mode = "dry-run" if args.dry_run else "apply"
+    checkpoint_path = args.checkpoint or f"reclassify-{version}-{mode}.checkpoint.json"
+    report_path = args.report or f"reclassify-{version}-{mode}.csv"
+
+    state = load_checkpoint(checkpoint_path, version, args.dry_run, args.restart)
+    if state["finished"]:
+        print(f"✅ Already finished ({state['scanned']} scanned, {state['changed']} changed) - pass --restart to run again")
+        return state
+    if state["max_id"] is None:
+        # Tickets created after the job starts are already scored by the live model
+        with SessionLocal() as db:
+            state["max_id"] = db.query(func.max(Ticket.id)).scalar() or 0
+    transitions = Counter(state["transitions"])
+    resumed = state["last_id"] > 0
+    print(f"{'Resuming' if resumed else 'Starting'} {mode} with {version} on tickets {state['last_id'] + 1}..{state['max_id']} "
+          f"({args.workers} workers x {args.threads} threads)", flush=True)
+
+    # Each worker process gets its own model; keep their intra-op threads low so the API keeps its cores
+    os.environ["CLASSIFIER_NUM_THREADS"] = str(args.threads)
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_path, args.backend, args.nice),
+    )
+    report_is_new = not resumed or not os.path.exists(report_path)
+    report_file = open(report_path, "w" if report_is_new else "a", newline="")
+    report = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+    if report_is_new:
+        report.writeheader()
+
+    def finish_chunk(rows, futures):
+        predictions = [prediction for future in futures for prediction in future.result()]
+        for row, (queue, _) in zip(rows, predictions):
+            transitions[f"{row.predicted_queue} -> {queue}"] += 1
+            if queue != row.predicted_queue:
+                state["changed"] += 1
+                report.writerow({
+                    "id": row.id,
+                    "ticket_number": row.ticket_number,
+                    "status": row.status.value if row.status else None,
+                    "old_queue": row.predicted_queue,
+                    "new_queue": queue,
+                    "old_department": row.assigned_department,
+                    "new_department": DEPARTMENT_MAPPING.get(queue, "sales"),
+                    "old_model_version": row.model_version,
+                })
+        if not args.dry_run:
+            apply_updates(rows, predictions, version)
+        report_file.flush()
+        # Checkpoint only after the chunk is written, so a crash re-does at most the chunks in flight
+        state["last_id"] = rows[-1].id
+        state["scanned"] += len(rows)
+        state["transitions"] = dict(transitions)
+        save_checkpoint(checkpoint_path, state)
+
+    start = time.perf_counter()
+    scanned_at_start = state["scanned"]
+    try:
+        # 1. Read a chunk and spread it over the workers; keep one chunk queued behind the one
+        # being finished so the pool doesn't sit idle during the DB write
+        in_flight = deque()
+        next_id = state["last_id"]
+        while True:
+            rows = read_chunk(next_id, state["max_id"], version, args)
+            if rows:
+                next_id = rows[-1].id
+                step = -(-len(rows) // args.workers)
+                futures = [
+                    pool.submit(_classify, [row.body for row in rows[i:i + step]], args.batch_size)
+                    for i in range(0, len(rows), step)
+                ]
+                in_flight.append((rows, futures))
+            if not in_flight:
+                break
+            if len(in_flight) < 2 and rows:
+                continue
+
+            # 2. Diff (and write) the oldest chunk, then checkpoint
+            finish_chunk(*in_flight.popleft())
+            elapsed = time.perf_counter() - start
+            done = state["scanned"] - scanned_at_start
+            print(f"   {state['scanned']} scanned, {state['changed']} changed, last id {state['last_id']}/{state['max_id']} "
+                  f"({done / elapsed:.0f} tickets/s)", flush=True)
+
+            # 3. Throttle: stay under --max-rate and give the live API room between chunks
+            if args.max_rate:
+                ahead = done / args.max_rate - elapsed
+                if ahead > 0:
+                    time.sleep(ahead)
+            if args.pause:
+                time.sleep(args.pause)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        report_file.close()
+
+    state["finished"] = True
+    save_checkpoint(checkpoint_path, state)
+    print(f"✅ {state['scanned']} tickets re-scored with {version}, {state['changed']} would change queue"
+          if args.dry_run else
+          f"✅ {state['scanned']} tickets re-scored with {version}, {state['changed']} moved to a new queue", flush=True)
+    print(f"   Changes: {report_path}", flush=True)
+    for transition, count in transitions.most_common(args.top):
+        old, new = transition.split(" -> ")
+        if old != new:
+            print(f"   {count:8d}  {transition}", flush=True)
+    return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score existing tickets with a model version and update or diff their queues")
+    parser.add_argument("--version", default=None, help="registry version to score with (default: current)")
+    parser.add_argument("--model-path", default=None, help="score with this model directory instead of a registry version")
+    parser.add_argument("--backend", default=None, help="torch|int8|onnx (default CLASSIFIER_BACKEND)")
+    parser.add_argument("--dry-run", action="store_true", help="only write the diff report, leave tickets unchanged")
+    parser.add_argument("--all", action="store_true", help="also re-score tickets already scored by this version")
+    parser.add_argument("--status", nargs="+", choices=[status.value for status in TicketStatus],
+                        help="only tickets in these statuses (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="tickets per keyset read and per update transaction")
+    parser.add_argument("--batch-size", type=int, default=64, help="tickets per forward pass")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes, each with its own model copy")
+    parser.add_argument("--threads", type=int, default=1, help="inference threads per worker")
+    parser.add_argument("--nice", type=int, default=10, help="niceness added to the worker processes")
+    parser.add_argument("--max-rate", type=float, default=0, help="tickets per second cap (0 = unlimited)")
+    parser.add_argument("--pause", type=float, default=0, help="seconds to sleep between chunks")
+    parser.add_argument("--checkpoint", default=None, help="resume file (default reclassify-<version>-<mode>.checkpoint.json)")
+    parser.add_argument("--report", default=None, help="CSV of changed tickets (default reclassify-<version>-<mode>.csv)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--top", type=int, default=20, help="queue transitions to print")
+    args = parser.parse_args()
+
+    reclassify(args)
@@ -1,22 +1,23 @@
-import pandas as pd
-import numpy as np
-import torch
 import os
 import sys
-import json
-from datasets import load_dataset, Dataset
 from transformers import (
     AutoTokenizer, 
     AutoModelForSequenceClassification, 
     TrainingArguments, 
     Trainer,
+    DataCollatorWithPadding,
     EvalPrediction,
     TrainerCallback
 )
-from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
 import pickle
 
+# Allow importing the serving code (backend/app) when run as `python training/train.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.model_registry import new_version, set_current
+from app.services.tokenization import MAX_LENGTH
+from dataset_cache import load_tokenized_tickets
+
 
 class ProgressCallback(TrainerCallback):
     """Prints training progress to stdout (visible in Docker logs where tqdm is not)."""
@@ -38,58 +39,40 @@ def compute_metrics(pred: EvalPrediction):
     }
 
 def train_bert_model():
-    # Get the directory where this script lives (works in Docker and locally)
-    training_dir = os.path.dirname(os.path.abspath(__file__))
-    
     # Detect if running in Docker/Codespace (limited resources)
     is_docker = os.environ.get("DOCKER_ENV", "").lower() == "true"
     if is_docker:
         print("🐳 Docker/Codespace detected — using lightweight training settings", flush=True)
     
-    print("Loading dataset...", flush=True)
-    dataset = load_dataset("Tobi-Bueck/customer-support-tickets")
-    df = pd.DataFrame(dataset['train'])
+    # Tokenization
+    model_name = "distilbert-base-uncased"
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
     
-    # Filter for top 10 categories for better quality
-    top_queues = df['queue'].value_counts().nlargest(10).index.tolist()
+    # Filtered, label-encoded and tokenized once, then memory-mapped from training/data_cache
+    # on later runs (see dataset_cache.py; TICKETS_DATA_FILE reads a local file instead of the hub)
+    dataset, le = load_tokenized_tickets(tokenizer, MAX_LENGTH, top_n=10)
+    top_queues = le.classes_.tolist()
     print(f"Fine-tuning on Top 10 queues: {top_queues}", flush=True)
-    df = df[df['queue'].isin(top_queues)]
-
-    # ENSURE TEXT IS STRING AND NOT NULL
-    df = df.dropna(subset=['body'])
-    df['body'] = df['body'].astype(str)
     
     # In Docker/Codespace, use a tiny subset — CPU-only training must be fast
-    if is_docker and len(df) > 500:
-        print(f"   Sampling 500 from {len(df)} rows for fast CPU training...", flush=True)
-        df = df.sample(n=500, random_state=42)
+    if is_docker and len(dataset) > 500:
+        print(f"   Sampling 500 from {len(dataset)} rows for fast CPU training...", flush=True)
+        dataset = dataset.shuffle(seed=42).select(range(500))
     
-    # Label Encoding
-    le = LabelEncoder()
-    df['label'] = le.fit_transform(df['queue'])
+    # Each run gets its own registry version directory (persisted by Docker volume);
+    # it only becomes the served model once training finishes and CURRENT is updated
+    version, save_path = new_version()
+    print(f"Model version: {version}", flush=True)
     
-    # Save Label Encoder inside the model directory (persisted by Docker volume)
-    save_path = os.path.join(training_dir, 'models', 'fine_tuned_bert')
-    os.makedirs(save_path, exist_ok=True)
+    # Save Label Encoder inside the model directory
     with open(os.path.join(save_path, 'label_encoder.pkl'), 'wb') as f:
         pickle.dump(le, f)
     
-    # Prepare HF Dataset
-    hf_dataset = Dataset.from_pandas(df[['body', 'label']])
-    hf_dataset = hf_dataset.rename_column("body", "text")
-    
-    # Split
-    hf_dataset = hf_dataset.train_test_split(test_size=0.1)
-    
-    # Tokenization
-    model_name = "distilbert-base-uncased"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    
-    def tokenize_function(examples):
-        return tokenizer(examples["text"], padding="max_length", truncation=True, max_length=128)
-    
-    print("Tokenizing data...", flush=True)
-    tokenized_datasets = hf_dataset.map(tokenize_function, batched=True)
+    # Split off a validation set for per-epoch evaluation (the held-out tickets are already excluded)
+    tokenized_datasets = dataset.train_test_split(test_size=0.1, seed=42)
+    # Batches are padded to their own longest ticket by the collator,
+    # and group_by_length puts tickets of similar length in the same batch
+    data_collator = DataCollatorWithPadding(tokenizer=tokenizer)
     
     # Model
     num_labels = len(top_queues)
@@ -112,6 +95,7 @@ def train_bert_model():
             dataloader_pin_memory=False,
             dataloader_num_workers=0,
             disable_tqdm=True,
+            group_by_length=True,
         )
     else:
         training_args = TrainingArguments(
@@ -126,6 +110,7 @@ def train_bert_model():
             eval_strategy="epoch",
             save_strategy="epoch",
             load_best_model_at_end=True,
+            group_by_length=True,
         )
     
     total_steps = (len(tokenized_datasets["train"]) // training_args.per_device_train_batch_size) * int(training_args.num_train_epochs)
@@ -140,19 +125,19 @@ def train_bert_model():
         train_dataset=tokenized_datasets["train"],
         eval_dataset=tokenized_datasets["test"],
         compute_metrics=compute_metrics,
+        data_collator=data_collator,
         callbacks=callbacks,
     )
     
     print("Starting fine-tuning...", flush=True)
     trainer.train()
     
-    # Save model and tokenizer
-    save_path = os.path.join(training_dir, 'models', 'fine_tuned_bert')
-    os.makedirs(save_path, exist_ok=True)
+    # Save model and tokenizer, then promote the version - running servers hot-swap to it
     model.save_pretrained(save_path)
     tokenizer.save_pretrained(save_path)
+    set_current(version)
     
-    print(f"Training complete. Model saved to {save_path}", flush=True)
+    print(f"Training complete. Model {version} saved to {save_path}", flush=True)
 
 if __name__ == "__main__":
     train_bert_model()
@@ -0,0 +1,55 @@
+import os
+import sys
+import pickle
+import argparse
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+# Allow importing the serving code (backend/app) when run as `python training/train_linear.py`
+training_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(training_dir))
+
+from dataset_cache import load_training_frame
+from app.services.linear_model import FirstStageModel, FIRST_STAGE_MODEL
+from app.services.model_registry import current_version, version_path
+
+
+def train_first_stage(output_dir, n_features, thresholds):
+    # Same tickets and queues BERT was trained on (held-out tickets excluded), so the cascade
+    # can only answer with labels the model directory's label encoder knows
+    with open(os.path.join(output_dir, 'label_encoder.pkl'), 'rb') as f:
+        classes = pickle.load(f).classes_.tolist()
+    df = load_training_frame(top_n=len(classes))
+    if sorted(df['queue'].unique().tolist()) != classes:
+        sys.exit(f"❌ Dataset queues {sorted(df['queue'].unique().tolist())} don't match the model's {classes}")
+    X_train, X_test, y_train, y_test = train_test_split(
+        df['text'].tolist(), df['queue'].tolist(), test_size=0.1, random_state=42
+    )
+    
+    print(f"Training hashed bag-of-words model on {len(X_train)} tickets...", flush=True)
+    model = FirstStageModel(n_features=n_features).fit(X_train, y_train)
+    
+    labels, confidence = model.predict_with_confidence(X_test)
+    correct = labels == np.array(y_test)
+    print(f"Validation accuracy (all tickets): {correct.mean():.4f}", flush=True)
+    
+    # Pick CASCADE_THRESHOLD from this table: coverage is the share answered without BERT
+    print("threshold  coverage  accuracy_on_covered", flush=True)
+    for threshold in thresholds:
+        covered = confidence >= threshold
+        accuracy = correct[covered].mean() if covered.any() else float('nan')
+        print(f"{threshold:9.2f}  {covered.mean():8.3f}  {accuracy:19.4f}", flush=True)
+    
+    out_path = os.path.join(output_dir, FIRST_STAGE_MODEL)
+    model.save(out_path)
+    print(f"✅ First-stage model written to {out_path}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the first-stage linear model of the classifier cascade")
+    parser.add_argument("--output", default=None, help="model directory; defaults to the current registry version")
+    parser.add_argument("--n-features", type=int, default=2 ** 18)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9, 0.95])
+    args = parser.parse_args()
+    
+    train_first_stage(args.output or version_path(current_version()), args.n_features, args.thresholds)
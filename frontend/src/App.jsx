@@ -28,6 +28,9 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [result, setResult] = useState(null);
   const [history, setHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [stats, setStats] = useState(null);
   const [error, setError] = useState('');
   const [activeTab, setActiveTab] = useState('create');
 
@@ -41,15 +44,67 @@ function App() {
     }
   }, []);
 
-  const fetchHistory = async (role, userId) => {
+  // The list endpoint returns one page at a time; X-Next-Cursor points at the next one
+  const fetchHistory = async (role, userId, cursor = null) => {
     try {
-      const response = await axios.get(`${API_BASE}/api/tickets/${role}/${userId}`);
-      setHistory(response.data);
+      const response = await axios.get(`${API_BASE}/api/tickets/${role}/${userId}`, {
+        params: cursor ? { cursor } : {}
+      });
+      setHistory(prev => cursor ? [...prev, ...response.data] : response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+      if (!cursor) {
+        fetchStats(role);
+      }
     } catch (err) {
       console.error('Failed to fetch history');
     }
   };
 
+  // Board counts come from the rollup table. It has no per-client split, so clients
+  // (who only have a handful of tickets) count what is loaded instead.
+  const fetchStats = async (role) => {
+    if (role === 'client') return;
+    try {
+      const response = await axios.get(`${API_BASE}/api/stats`, {
+        params: role === 'admin' ? {} : { department: role }
+      });
+      setStats(response.data);
+    } catch (err) {
+      console.error('Failed to fetch stats');
+    }
+  };
+
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchHistory(user.role, user.user_id, nextCursor);
+    setLoadingMore(false);
+  };
+
+  // Until every page is loaded the board only knows a lower bound
+  const countLabel = (count) => nextCursor ? `${count}+` : count;
+  const totalCount = () => stats ? stats.total : countLabel(history.length);
+  const statusCount = (status) => stats
+    ? stats.by_status[status] || 0
+    : countLabel(history.filter(t => t.status === status).length);
+
+  // Long-poll until the background worker has written the reply
+  const pollReply = async (ticketNumber) => {
+    for (let i = 0; i < 10; i++) {
+      try {
+        const response = await axios.get(`${API_BASE}/api/replies/${ticketNumber}`, { params: { wait: 25 } });
+        if (response.data.reply_status !== 'pending') {
+          setResult(prev => prev && prev.ticket_number === ticketNumber
+            ? { ...prev, auto_reply: response.data.auto_reply, reply_status: response.data.reply_status }
+            : prev);
+          return;
+        }
+      } catch (err) {
+        console.error('Failed to fetch reply');
+        return;
+      }
+    }
+  };
+
   const handleLogin = (userData) => {
     setUser(userData);
     fetchHistory(userData.role, userData.user_id);
@@ -59,6 +114,8 @@ function App() {
     localStorage.removeItem('user');
     setUser(null);
     setHistory([]);
+    setNextCursor(null);
+    setStats(null);
     setResult(null);
     setDescription('');
   };
@@ -78,6 +135,9 @@ function App() {
         client_name: user.full_name
       });
       setResult(response.data);
+      if (response.data.reply_status === 'pending') {
+        pollReply(response.data.ticket_number);
+      }
       fetchHistory(user.role, user.user_id);
       setDescription('');
       setActiveTab('messages'); // Switch to messages tab to show response
@@ -168,7 +228,7 @@ function App() {
           <div tabId="history" className="tab-content-panel">
             <h2 className="panel-title">
               <Clock size={20} />
-              My Tickets ({history.length})
+              My Tickets ({totalCount()})
             </h2>
             
             <div className="kanban-board">
@@ -177,7 +237,7 @@ function App() {
                 <div className="column-header pending-header">
                   <span className="column-title">Pending</span>
                   <span className="column-count">
-                    {history.filter(t => t.status === 'pending').length}
+                    {statusCount('pending')}
                   </span>
                 </div>
                 <div className="column-content">
@@ -188,7 +248,7 @@ function App() {
                         <span className="status-dot pending-dot"></span>
                       </div>
                       <h4 className="card-title">{ticket.predicted_queue}</h4>
-                      <p className="card-body">{ticket.body.substring(0, 80)}...</p>
+                      <p className="card-body">{ticket.body_preview.substring(0, 80)}...</p>
                       <div className="card-footer">
                         <span className="dept-tag">{ticket.assigned_department.replace('_', ' ')}</span>
                         <span className="time-label">
@@ -205,7 +265,7 @@ function App() {
                 <div className="column-header progress-header">
                   <span className="column-title">In Progress</span>
                   <span className="column-count">
-                    {history.filter(t => t.status === 'in_progress').length}
+                    {statusCount('in_progress')}
                   </span>
                 </div>
                 <div className="column-content">
@@ -216,7 +276,7 @@ function App() {
                         <span className="status-dot progress-dot"></span>
                       </div>
                       <h4 className="card-title">{ticket.predicted_queue}</h4>
-                      <p className="card-body">{ticket.body.substring(0, 80)}...</p>
+                      <p className="card-body">{ticket.body_preview.substring(0, 80)}...</p>
                       <div className="card-footer">
                         <span className="dept-tag">{ticket.assigned_department.replace('_', ' ')}</span>
                         <span className="time-label">
@@ -233,7 +293,7 @@ function App() {
                 <div className="column-header resolved-header">
                   <span className="column-title">Resolved</span>
                   <span className="column-count">
-                    {history.filter(t => t.status === 'resolved').length}
+                    {statusCount('resolved')}
                   </span>
                 </div>
                 <div className="column-content">
@@ -244,7 +304,7 @@ function App() {
                         <span className="status-dot resolved-dot"></span>
                       </div>
                       <h4 className="card-title">{ticket.predicted_queue}</h4>
-                      <p className="card-body">{ticket.body.substring(0, 80)}...</p>
+                      <p className="card-body">{ticket.body_preview.substring(0, 80)}...</p>
                       <div className="card-footer">
                         <span className="dept-tag">{ticket.assigned_department.replace('_', ' ')}</span>
                         <span className="time-label">
@@ -256,6 +316,12 @@ function App() {
                 </div>
               </div>
             </div>
+
+            {nextCursor && (
+              <button onClick={loadMore} className="load-more-btn" disabled={loadingMore}>
+                {loadingMore ? <Loader2 className="spinner" size={16} /> : 'Load more tickets'}
+              </button>
+            )}
           </div>
 
           {/* Tab 3: Messages */}
@@ -288,6 +354,10 @@ function App() {
                     <div className="message-bubble">
                       <div className="message-label">Shanyan AI Bot</div>
                       <div className="message-text">
+                        {result.reply_status === 'pending' && (
+                          <span><Loader2 size={16} className="spinner" /> Drafting your reply...</span>
+                        )}
+                        {result.reply_status === 'failed' && 'We could not draft a reply right now. Our team will get back to you shortly.'}
                         {result.auto_reply}
                       </div>
                       <div className="message-time">